@@ -0,0 +1,334 @@
+import time
+
+# Início da contagem do tempo até "pronto" (depois do boot do interpretador)
+STARTED_AT = time.perf_counter_ns()
+
+import sys
+import signal
+import argparse
+import threading
+
+# Tempo máximo aceitável do início até o tradutor estar lendo os controles
+STARTUP_BUDGET_MS = 500
+EVENT_INTERVAL = 0.02
+
+
+def positive_int(text):
+    # Como o "start" do socket de controle: 0 ou negativo é erro, não "usa o padrão"
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{text}'") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be 1 or more, got {value}")
+    return value
+
+
+def use_profile(module, path):
+    # Os engines só são importados aqui: nada de Tk, e hid/pynput só quando forem usados
+    if path:
+        from engines.settings import settings_path_for
+        if module.__name__ == 'engines.configurator':
+            from pathlib import Path
+            module.PATH_JSON = Path(path)
+        else:
+            from engines.reportrate import devices_path_for
+            module.PATH_JSON = str(path)
+            module.SETTINGS_PATH = settings_path_for(path)
+            module.DEVICES_PATH = devices_path_for(path)
+    return module
+
+
+def use_simulator(controllers):
+    from engines import hidbackend
+    from engines.hidsim import SimulatedHID
+    hidbackend.use_backend(SimulatedHID(controllers=controllers))
+
+
+def report_ready(event, started_at):
+    ready_ms = (event.t_ns - started_at) / 1e6
+    print(f"Ready in {ready_ms:.0f} ms with {event.players} players (budget {STARTUP_BUDGET_MS} ms)")
+    if ready_ms > STARTUP_BUDGET_MS:
+        print(f"Warning: startup took longer than {STARTUP_BUDGET_MS} ms", file=sys.stderr)
+
+
+def run_worker(target, kwargs, stop):
+    # O engine roda numa thread; a principal fica livre para Ctrl+C, SIGTERM e o bus
+    from engines.events import ErrorEvent, Ready, bus
+    worker = threading.Thread(target=target, kwargs=kwargs, daemon=True)
+    # Ctrl+C e SIGTERM só pedem a parada: o engine solta as teclas e imprime as estatísticas.
+    # (Um KeyboardInterrupt dentro do join() deixaria a thread como se já tivesse terminado.)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop())
+    worker.start()
+    failed = False
+    while worker.is_alive() or bus.queue:
+        worker.join(EVENT_INTERVAL)
+        for event in bus.drain():
+            if isinstance(event, Ready):
+                report_ready(event, STARTED_AT)
+            elif isinstance(event, ErrorEvent):
+                failed = True
+    return 1 if failed else 0
+
+
+def cmd_list_devices(args):
+    from engines.controllerGetter import detect_controllers
+    from engines import translator
+    from engines.profiles import load_profiles
+    use_profile(translator, args.profile)
+    try:
+        store = load_profiles(translator.PATH_JSON)
+    except (ValueError, OSError):
+        store = None
+    controllers = detect_controllers()
+    if not controllers:
+        print("No controllers found.")
+        return 1
+    decoders = store.match(controllers) if store is not None else [None] * len(controllers)
+    for index, (controller, decoder) in enumerate(zip(controllers, decoders)):
+        status = 'calibrated' if decoder is not None else 'not calibrated'
+        print(f"{index + 1}. {controller['name']}  {controller['vendor_id']:04x}:{controller['product_id']:04x}  "
+              f"serial '{controller['serial_number']}'  interface {controller['interface_number']}  "
+              f"path {controller['path']!r}  [{status}]")
+    return 0
+
+
+def cmd_calibrate(args):
+    from engines import configurator
+    use_profile(configurator, args.profile)
+
+    def stop():
+        configurator.is_running = False
+
+    return run_worker(configurator.start_multiplayer_calibration, {'mode': args.mode, 'players': args.players}, stop)
+
+
+def print_analysis(device, result):
+    print(f"Controller {device}: {result['reports']} reports, {result['width']} bytes, idle {result['idle']}")
+    for button, entry in result['profile'].items():
+        if entry.get('type') == 'axis':
+            print(f"  {button:>7}: byte {entry['index']} axis, center {entry['center']}, range {entry['range']:+d}")
+        else:
+            print(f"  {button:>7}: byte {entry['index']} mask 0x{entry['mask']:02x}")
+    if result['analog']:
+        print(f"  analog bytes (ignored): {result['analog']}")
+    for noisy in result['noisy']:
+        detail = f"noise +-{noisy['noise']}" if 'noise' in noisy else f"bit mask 0x{noisy['mask']:02x} flickers"
+        print(f"  noisy: byte {noisy['index']} {detail}")
+    if result['missing']:
+        print(f"  never pressed: {', '.join(result['missing'])}")
+    for where in result['unnamed']:
+        print(f"  extra input without a name: {where}")
+    for conflict in result['conflicts']:
+        print(f"  conflict: {conflict}")
+
+
+def cmd_auto_calibrate(args):
+    import json
+    from engines import autocalib, configurator
+    from engines.controllerGetter import detect_controllers
+    from engines.profiles import ProfileStore, load_profiles
+    use_profile(configurator, args.profile)
+    buttons = args.buttons or configurator.BUTTONS_TO_MAP
+
+    def connected():
+        # A análise em si é offline: sem hidapi os perfis só ficam sem controle
+        try:
+            return detect_controllers()[:args.players] if args.players else detect_controllers()
+        except (ImportError, OSError):
+            return []
+
+    controllers = None
+    if args.record:
+        controllers = connected()
+        if not controllers:
+            print("No controllers found. Please connect them and try again.")
+            return 1
+        print(f"Recording {len(controllers)} controllers for {args.record:.0f} s. Press each button once in this "
+              f"order: {' '.join(buttons)}; then press anything until the recording ends.")
+        records = autocalib.record_session(args.trace, controllers, args.record)
+        print(f"{records} reports saved in {args.trace}")
+
+    started = time.perf_counter()
+    try:
+        results = autocalib.calibrate_trace(args.trace, buttons)
+    except ImportError as ex:
+        print(f"Error: {ex}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as ex:
+        print(f"Error: could not read {args.trace} ({ex})", file=sys.stderr)
+        return 1
+    print(f"Analyzed {args.trace} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for device, result in results.items():
+        print_analysis(device, result)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump({str(device): result for device, result in results.items()}, file, indent=4)
+    if args.dry_run:
+        return 0
+
+    try:
+        store = load_profiles(configurator.PATH_JSON)
+    except (ValueError, OSError) as ex:
+        print(f"Could not read {configurator.PATH_JSON} ({ex}). Starting with empty profiles.")
+        store = ProfileStore(configurator.PATH_JSON)
+    if controllers is None:
+        controllers = connected()
+    # O trace numera os controles pela posição: vale o controle conectado na mesma posição
+    for device, result in results.items():
+        if not result['profile']:
+            continue
+        if device < len(controllers):
+            store.put(controllers[device], result['profile'])
+            print(f"Controller {device}: profile saved for {controllers[device]['name']}")
+        else:
+            store.put_unassigned(device, result['profile'])
+            print(f"Controller {device}: profile saved for whichever controller is number {device + 1} next time")
+    store.save()
+    print(f"Profiles saved in {configurator.PATH_JSON}")
+    return 0
+
+
+def cmd_measure_devices(args):
+    from engines import translator
+    from engines.controllerGetter import detect_controllers
+    from engines.reportrate import load_characteristics, measure_devices, read_strategy, save_characteristics
+    use_profile(translator, args.profile)
+    controllers = detect_controllers()
+    if args.players:
+        controllers = controllers[:args.players]
+    if not controllers:
+        print("No controllers found.")
+        return 1
+    print(f"Measuring {len(controllers)} controllers for {args.seconds:.0f} s. Please DO NOT touch any buttons.")
+    results, errors = measure_devices(controllers, args.seconds)
+    for name, error in errors.items():
+        print(f"Error reading {name}: {error}", file=sys.stderr)
+    for result in results.values():
+        if result['interval_ms'] is None:
+            print(f"{result['name']}: {result['reports']} reports, sends only on change")
+        else:
+            behavior = 'repeats idle reports' if result['idle_repeats'] else 'sends only on change'
+            print(f"{result['name']}: {result['rate_hz']:.0f} reports/s, interval {result['interval_ms']:.2f} ms "
+                  f"(p99 {result['interval_p99_ms']:.2f}), jitter {result['jitter_ms']:.2f} ms, "
+                  f"{result['report_length']} bytes, {behavior}")
+        for mode in ('threaded', 'auto', 'polling'):
+            strategy = read_strategy(result, mode, translator.POLL_INTERVAL)
+            print(f"  {mode:>8}: {strategy['read']} reads, {strategy['reason']}, batches of {strategy['drain']}, "
+                  f"{strategy['read_size']}-byte reads")
+    if args.dry_run or not results:
+        return 1 if errors else 0
+    characteristics = load_characteristics(translator.DEVICES_PATH)
+    characteristics.update(results)
+    save_characteristics(translator.DEVICES_PATH, characteristics)
+    print(f"Device characteristics saved in {translator.DEVICES_PATH}")
+    return 1 if errors else 0
+
+
+def cmd_translate(args):
+    from engines import translator
+    use_profile(translator, args.profile)
+    kwargs = {
+        'mode': args.mode,
+        'backend': args.backend,
+        'players': args.players,
+        'stats_path': args.stats,
+        'capture_path': args.capture,
+    }
+    return run_worker(translator.start_translator, kwargs, translator.stop_translator)
+
+
+def cmd_serve(args):
+    from engines import translator
+    from engines.control import CONTROL_SOCKET, CommandError, ControlServer, TranslatorService
+    from engines.events import Ready, bus
+    use_profile(translator, args.profile)
+    try:
+        service = TranslatorService(mode=args.mode, backend=args.backend, players=args.players, stats_path=args.stats)
+    except CommandError as ex:
+        print(f"Error: {ex}", file=sys.stderr)
+        return 1
+    socket_path = args.socket or CONTROL_SOCKET
+    try:
+        server = ControlServer(socket_path, service)
+    except OSError as ex:
+        print(f"Error: could not listen on {socket_path} ({ex})", file=sys.stderr)
+        return 1
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: service.shutdown_requested.set())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Control socket listening on {socket_path}")
+    if args.start:
+        service.start()
+
+    # A thread principal só repassa os eventos do bus para o serviço (ready, erros)
+    while not service.shutdown_requested.wait(EVENT_INTERVAL):
+        for event in bus.drain():
+            service.handle_event(event)
+            if isinstance(event, Ready):
+                report_ready(event, service.started_at)
+    if service.running():
+        service.stop()
+    server.shutdown()
+    server.server_close()
+    print("Control socket closed.")
+    return 0
+
+
+def main():
+    global STARTUP_BUDGET_MS
+    parser = argparse.ArgumentParser(description="Universal Gamepad without the GUI (kiosks, autostart, SSH).")
+    parser.add_argument('--profile', help="profiles.json to use (settings.json is read from the same folder)")
+    parser.add_argument('--players', type=positive_int, help="maximum number of players (default: max_players in settings.json)")
+    parser.add_argument('--simulate', type=int, metavar='N', help="use N simulated controllers instead of USB devices")
+    parser.add_argument('--startup-budget-ms', type=int, default=STARTUP_BUDGET_MS)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list-devices', help="show connected controllers and whether they are calibrated")
+
+    calibrate = commands.add_parser('calibrate', help="calibrate the connected controllers")
+    calibrate.add_argument('--mode', choices=['parallel', 'sequential'])
+
+    auto = commands.add_parser('auto-calibrate', help="build profiles from a recorded .hidtrace (needs NumPy)")
+    auto.add_argument('trace', help=".hidtrace to analyze (written first when --record is given)")
+    auto.add_argument('--record', type=float, metavar='SECONDS', help="record the connected controllers first")
+    auto.add_argument('--buttons', nargs='+', default=None, help="button names, in the order of the first presses")
+    auto.add_argument('--report', help="save the full analysis here (.json)")
+    auto.add_argument('--dry-run', action='store_true', help="only print the analysis, do not touch profiles.json")
+
+    measure = commands.add_parser('measure-devices', help="measure report rate, jitter and length of each controller")
+    measure.add_argument('--seconds', type=float, default=3.0)
+    measure.add_argument('--dry-run', action='store_true', help="only print the measurements, do not save them")
+
+    translate = commands.add_parser('translate', help="translate controllers to keyboard until Ctrl+C / SIGTERM")
+    translate.add_argument('--mode', choices=['threaded', 'polling', 'auto'])
+    translate.add_argument('--backend', choices=['pynput', 'null', 'recording'])
+    translate.add_argument('--stats', help="save latency stats here on exit (.json or .csv)")
+    translate.add_argument('--capture', help="record raw reports to this .hidtrace file")
+
+    serve = commands.add_parser('serve', help="run as a service controlled through a local socket")
+    serve.add_argument('--socket', help="Unix socket path (default: universal-gamepad.sock in the temp folder)")
+    serve.add_argument('--start', action='store_true', help="start translating right away")
+    serve.add_argument('--mode', choices=['threaded', 'polling', 'auto'])
+    serve.add_argument('--backend', choices=['pynput', 'null', 'recording'])
+    serve.add_argument('--stats', help="save latency stats here whenever the translator stops")
+
+    args = parser.parse_args()
+    STARTUP_BUDGET_MS = args.startup_budget_ms
+    if args.simulate:
+        use_simulator(args.simulate)
+
+    handlers = {
+        'list-devices': cmd_list_devices,
+        'calibrate': cmd_calibrate,
+        'auto-calibrate': cmd_auto_calibrate,
+        'measure-devices': cmd_measure_devices,
+        'translate': cmd_translate,
+        'serve': cmd_serve,
+    }
+    return handlers[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
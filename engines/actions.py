@@ -0,0 +1,165 @@
+import math
+import time
+
+# Ações por botão além da tecla simples, no mapa de teclas do jogador (settings.json):
+#   "A": "v"                                              tecla segurada enquanto o botão está apertado
+#   "B": {"key": "c", "turbo_hz": 30}                     aperta e solta a tecla 30x por segundo enquanto segura
+#   "X": {"macro": [["down", 30], ["down+right", 30], ["right+v", 40]]}
+#                                                         sequência de teclas (segura cada passo por ms)
+# Turbo e macro rodam no Scheduler do emissor (engines/scheduler.py).
+MIN_STEP_MS = 1
+# Acima disto o turbo só ocupa o emissor: nenhum jogo lê a tecla tão rápido
+MAX_TURBO_HZ = 1000
+
+
+class Turbo:
+    def __init__(self, key, hz, output, scheduler, player_stats):
+        self.key = key
+        self.half_period = int(1e9 / hz / 2)
+        self.output = output
+        self.scheduler = scheduler
+        self.stats = player_stats
+        self.timer = None
+        self.down = False
+
+    # press/release devolvem quantas teclas saíram na hora; as dos timers somam direto nas estatísticas
+    def press(self, t_ns):
+        self.scheduler.cancel(self.timer)
+        self.down = False
+        return self.flip(t_ns)
+
+    def flip(self, t_ns):
+        if self.down:
+            self.output.release(self.key)
+        else:
+            self.output.press(self.key)
+        self.down = not self.down
+        # Próximo disparo conta do instante pedido, não do real: o erro não se acumula
+        due = t_ns + self.half_period
+        now = time.perf_counter_ns()
+        if due < now:
+            due = now
+        self.timer = self.scheduler.schedule(due, self.tick)
+        return 1
+
+    def tick(self, t_ns):
+        self.stats.events += self.flip(t_ns)
+
+    def release(self, t_ns):
+        return self.cancel()
+
+    def cancel(self):
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+        if self.down:
+            self.output.release(self.key)
+            self.down = False
+            return 1
+        return 0
+
+
+class Macro:
+    def __init__(self, steps, output, scheduler, player_stats):
+        # steps: [(teclas já resolvidas, duração em ns)]
+        self.steps = steps
+        self.output = output
+        self.scheduler = scheduler
+        self.stats = player_stats
+        self.timer = None
+        self.index = None
+        self.held = ()
+
+    def press(self, t_ns):
+        # Macro em andamento não recomeça; um novo aperto depois do fim toca de novo
+        if self.index is not None:
+            return 0
+        self.index = 0
+        return self.step(t_ns)
+
+    def step(self, t_ns):
+        if self.index == len(self.steps):
+            return self.finish()
+        keys, duration = self.steps[self.index]
+        self.index += 1
+        events = 0
+        for key in self.held:
+            if key not in keys:
+                self.output.release(key)
+                events += 1
+        for key in keys:
+            if key not in self.held:
+                self.output.press(key)
+                events += 1
+        self.held = keys
+        self.timer = self.scheduler.schedule(t_ns + duration, self.tick)
+        return events
+
+    def tick(self, t_ns):
+        self.stats.events += self.step(t_ns)
+
+    def release(self, t_ns):
+        # Soltar o botão não corta a macro
+        return 0
+
+    def finish(self):
+        for key in self.held:
+            self.output.release(key)
+        events = len(self.held)
+        self.held = ()
+        self.index = None
+        self.timer = None
+        return events
+
+    def cancel(self):
+        self.scheduler.cancel(self.timer)
+        return self.finish()
+
+
+def is_action(spec):
+    return isinstance(spec, dict)
+
+
+def action_label(spec):
+    # Texto curto para o log da interface
+    if not is_action(spec):
+        return spec
+    if 'macro' in spec:
+        return 'macro ' + ','.join(str(keys) for keys, _ in spec['macro'])
+    return f"{spec['key']} turbo {spec['turbo_hz']}Hz"
+
+
+def is_number(value):
+    # bool é int em Python, mas true/false no JSON é erro de digitação
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def macro_steps(macro, output):
+    if not isinstance(macro, list) or not macro:
+        raise ValueError(f"'macro' must be a non-empty list of [keys, ms] steps, got {macro!r}")
+    steps = []
+    for number, step in enumerate(macro, 1):
+        if not isinstance(step, list) or len(step) != 2:
+            raise ValueError(f"macro step {number} must be [keys, ms], got {step!r}")
+        keys, ms = step
+        names = str(keys).split('+')
+        if not isinstance(keys, (str, int)) or isinstance(keys, bool) or not all(names):
+            raise ValueError(f"macro step {number} needs keys like \"down+v\", got {keys!r}")
+        if not is_number(ms) or ms < 0:
+            raise ValueError(f"macro step {number} needs a duration in ms of 0 or more, got {ms!r}")
+        steps.append((tuple(output.resolve(name) for name in names), int(max(ms, MIN_STEP_MS) * 1e6)))
+    return steps
+
+
+def create_action(spec, output, scheduler, player_stats):
+    # Erros de configuração saem como ValueError com a explicação (ver player_setup no tradutor)
+    if 'macro' in spec:
+        return Macro(macro_steps(spec['macro'], output), output, scheduler, player_stats)
+    if 'turbo_hz' in spec:
+        hz = spec['turbo_hz']
+        if not is_number(hz) or not 0 < hz <= MAX_TURBO_HZ:
+            raise ValueError(f"'turbo_hz' must be a number above 0 and up to {MAX_TURBO_HZ}, got {hz!r}")
+        key = spec.get('key')
+        if not isinstance(key, (str, int)) or isinstance(key, bool) or key == '':
+            raise ValueError(f"turbo needs the 'key' to press, got {key!r}")
+        return Turbo(output.resolve(str(key)), hz, output, scheduler, player_stats)
+    raise ValueError(f"Unknown button action {spec!r}: use 'turbo_hz' or 'macro'")
@@ -0,0 +1,256 @@
+import time
+import queue
+import threading
+from .capture import HEADER, MULTI_DEVICE_WIDTH, CaptureReader, CaptureWriter
+from .configurator import BUTTONS_TO_MAP, READ_TIMEOUT_MS, is_axis
+from .decoder import AXIS_DEADZONE, axis_entry, compile_profile
+from .hidbackend import get_hid
+
+# Calibração offline a partir de um .hidtrace gravado com os botões sendo apertados à vontade.
+# Os nomes saem da ordem em que cada botão aparece pela primeira vez: basta começar a
+# gravação apertando cada botão uma vez, na ordem de BUTTONS_TO_MAP, e depois apertar
+# qualquer coisa (combinações incluídas) pelo resto da gravação.
+#
+# Por byte do relatório:
+#   constante          -> ignorado
+#   repousa no meio e vai até uma ponta -> eixo (uma direção por ponta, com o ruído medido)
+#   muitos valores     -> analógico (gatilho, contador), ignorado e avisado
+#   senão              -> digital: cada bit vira uma coluna e bits que mudam sempre juntos
+#                         (mesmo em bytes diferentes) são um botão só
+# O NumPy só é importado aqui dentro: o resto do programa não depende dele.
+
+# Bit ativo por menos que isto (mediana) é ruído, não um botão
+MIN_PRESS_MS = 8
+# Bits ativos juntos em pelo menos esta fração das vezes são o mesmo botão
+SAME_BUTTON = 0.98
+# Byte que não é eixo e tem mais valores distintos que isto é analógico
+ANALOG_VALUES = 16
+# Desvio do centro que ainda conta como ruído de repouso de um eixo
+AXIS_NOISE_LIMIT = 24
+# O repouso de um byte é a média da janela de +-CENTER_WINDOW valores onde ele passou mais
+# tempo: num eixo com ruído o valor mais comum sozinho pode ser uma das pontas
+CENTER_WINDOW = 8
+RECORD_DEVICE_TIMEOUT_S = 1.0
+
+
+def load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("auto-calibration needs NumPy (pip install numpy)") from None
+    return numpy
+
+
+def load_trace(path):
+    # {controle: (instantes em ns, relatórios como matriz uint8)} lido de uma vez do mmap
+    np = load_numpy()
+    with CaptureReader(path) as reader:
+        record = np.dtype([('delta_us', '<u4'), ('device', 'u1'), ('length', 'u1'),
+                           ('payload', 'u1', (reader.width,))])
+        mapped = np.frombuffer(reader.map, dtype=record, count=reader.count, offset=HEADER.size)
+        data = mapped.copy()
+        # O mmap só fecha sem views abertas
+        del mapped
+    times_ns = np.cumsum(data['delta_us'], dtype=np.int64) * 1000
+    traces = {}
+    for device in np.unique(data['device']):
+        selected = data['device'] == device
+        # Relatórios mais curtos que a largura do arquivo: só os bytes que todos têm
+        length = int(data['length'][selected].min())
+        traces[int(device)] = (times_ns[selected], data['payload'][selected, :length])
+    return traces
+
+
+def active_runs_ms(np, active, times_ns):
+    # Duração de cada trecho em que a coluna ficou ativa
+    edges = np.diff(active.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.minimum(np.flatnonzero(edges == -1), len(times_ns) - 1)
+    return (times_ns[ends] - times_ns[starts]) / 1e6
+
+
+def analyze_axis(np, column, index, center, elements, result):
+    deviation = np.abs(column.astype(np.int16) - center)
+    near = deviation[deviation <= AXIS_NOISE_LIMIT]
+    noise = int(near.max()) if near.size else 0
+    if noise:
+        result['noisy'].append({'index': index, 'noise': noise})
+    for extreme in (int(column.min()), int(column.max())):
+        if not is_axis(center, extreme):
+            continue
+        travel = extreme - center
+        moved = (column.astype(np.int16) - center) * (1 if travel > 0 else -1)
+        active = np.flatnonzero(moved >= AXIS_DEADZONE * abs(travel))
+        elements.append({
+            'first': int(active[0]),
+            'entry': axis_entry(index, center, extreme, noise),
+            'where': f"byte {index} axis {'+' if travel > 0 else '-'}",
+        })
+
+
+def resting_value(np, counts):
+    window = np.ones(2 * CENTER_WINDOW + 1)
+    peak = int(np.convolve(counts, window, 'same').argmax())
+    low = max(peak - CENTER_WINDOW, 0)
+    near = counts[low:peak + CENTER_WINDOW + 1]
+    return int(round(float(np.arange(low, low + len(near)) @ near / near.sum())))
+
+
+def analyze_digital(np, reports, times_ns, durations, columns, elements, result):
+    # Uma coluna por bit; o repouso de cada bit é o valor em que ele passou mais tempo
+    bits = np.unpackbits(reports[:, columns], axis=1, bitorder='little').astype(bool)
+    idle_bits = (durations @ bits) * 2 > durations.sum()
+    idle = np.packbits(idle_bits, bitorder='little')
+    result['idle'].update({int(index): int(value) for index, value in zip(columns, idle)})
+
+    active = bits != idle_bits
+    candidates = []
+    for position in np.flatnonzero(active.any(axis=0)):
+        index, bit = int(columns[position // 8]), int(position % 8)
+        runs = active_runs_ms(np, active[:, position], times_ns)
+        if np.median(runs) < MIN_PRESS_MS:
+            result['noisy'].append({'index': index, 'mask': 1 << bit})
+        else:
+            candidates.append(position)
+    if not candidates:
+        return
+
+    # Quantos relatórios cada par de bits passou ativo junto (uma multiplicação de matriz)
+    matrix = active[:, candidates].astype(np.float32)
+    together = matrix.T @ matrix
+    alone = np.diag(together)
+    groups = []
+    for member in range(len(candidates)):
+        for group in groups:
+            leader = group[0]
+            if together[member, leader] >= SAME_BUTTON * max(alone[member], alone[leader]):
+                group.append(member)
+                break
+        else:
+            groups.append([member])
+
+    first_active = active[:, candidates].argmax(axis=0)
+    for group in groups:
+        by_index = {}
+        for member in group:
+            position = candidates[member]
+            index = int(columns[position // 8])
+            by_index[index] = by_index.get(index, 0) | (1 << int(position % 8))
+        # O perfil guarda um byte por botão: o de menos bits do grupo (um bit de botão,
+        # não um byte de pressão que só por acaso chegou em 0xFF)
+        index = min(sorted(by_index), key=lambda key: bin(by_index[key]).count('1'))
+        also = [key for key in sorted(by_index) if key != index]
+        elements.append({
+            'first': int(first_active[group].min()),
+            'entry': {'index': index, 'idle_value': result['idle'][index], 'mask': by_index[index]},
+            'where': f"byte {index} mask 0x{by_index[index]:02x}" + (f" (also bytes {also})" if also else ''),
+            'leader': group[0],
+        })
+
+    # Um botão que nunca aparece sem outro: chapéu codificado em valor, fantasma ou fio cruzado
+    where = {element['leader']: element['where'] for element in elements if 'leader' in element}
+    for first in groups:
+        for second in groups:
+            a, b = first[0], second[0]
+            if a != b and together[a, b] >= SAME_BUTTON * alone[a] and alone[b] > alone[a]:
+                result['conflicts'].append(f"{where[a]} is never active without {where[b]}")
+
+
+def analyze_device(times_ns, reports, buttons=BUTTONS_TO_MAP):
+    np = load_numpy()
+    result = {'reports': len(reports), 'width': reports.shape[1], 'idle': {}, 'analog': [], 'noisy': [],
+              'conflicts': [], 'missing': [], 'unnamed': [], 'profile': {}}
+    if not len(reports):
+        result['missing'] = list(buttons)
+        return result
+
+    # Quanto tempo cada relatório valeu: controles que só mandam mudanças pesam certo
+    durations = np.diff(times_ns, append=times_ns[-1]).astype(np.float64)
+    if not durations.any():
+        durations[:] = 1
+    elements = []
+    digital = []
+    for index in range(reports.shape[1]):
+        column = reports[:, index]
+        counts = np.bincount(column, weights=durations, minlength=256)
+        center = resting_value(np, counts)
+        result['idle'][index] = center
+        values = np.flatnonzero(np.bincount(column, minlength=256))
+        if len(values) == 1:
+            continue
+        if is_axis(center, int(values[0])) or is_axis(center, int(values[-1])):
+            analyze_axis(np, column, index, center, elements, result)
+        elif len(values) > ANALOG_VALUES:
+            result['analog'].append(index)
+        else:
+            digital.append(index)
+    if digital:
+        analyze_digital(np, reports, times_ns, durations, np.array(digital), elements, result)
+    result['idle'] = [result['idle'][index] for index in range(reports.shape[1])]
+
+    # Nomes pela ordem da primeira vez que cada botão apareceu
+    elements.sort(key=lambda element: element['first'])
+    for before, after in zip(elements, elements[1:]):
+        if before['first'] == after['first']:
+            result['conflicts'].append(f"{before['where']} and {after['where']} were first pressed together: "
+                                       "their names may be swapped")
+    for button, element in zip(buttons, elements):
+        result['profile'][button] = element['entry']
+    result['missing'] = list(buttons[len(elements):])
+    result['unnamed'] = [element['where'] for element in elements[len(buttons):]]
+    result['elements'] = [element['where'] for element in elements]
+    return result
+
+
+def calibrate_trace(path, buttons=BUTTONS_TO_MAP):
+    # {controle do trace: resultado de analyze_device}
+    results = {device: analyze_device(times_ns, reports, buttons)
+               for device, (times_ns, reports) in load_trace(path).items()}
+    for result in results.values():
+        # O perfil tem que compilar e decodificar o repouso como "nada apertado"
+        decoder = compile_profile(result['profile'])
+        if decoder.decode(result['idle']) != decoder.idle_pressed:
+            result['conflicts'].append("the idle report decodes as a pressed button")
+    return results
+
+
+def record_session(path, controllers, duration_s):
+    # Grava os relatórios crus de todos os controles, sem precisar de perfil.
+    # O número de cada controle no trace é a posição dele na lista.
+    reports = queue.Queue()
+    stop = threading.Event()
+
+    def read(device, controller):
+        gamepad = get_hid().device()
+        try:
+            gamepad.open_path(controller['path'])
+            gamepad.set_nonblocking(False)
+            while not stop.is_set():
+                data = gamepad.read(64, READ_TIMEOUT_MS)
+                if data:
+                    reports.put((device, data, time.perf_counter_ns()))
+        except IOError as ex:
+            print(f"Error reading {controller['name']}: {ex}")
+        finally:
+            gamepad.close()
+
+    readers = [threading.Thread(target=read, args=(device, controller), daemon=True)
+               for device, controller in enumerate(controllers)]
+    with CaptureWriter(path, MULTI_DEVICE_WIDTH if len(controllers) > 1 else None) as writer:
+        for reader in readers:
+            reader.start()
+        deadline = time.monotonic() + duration_s
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    device, data, t_ns = reports.get(timeout=READ_TIMEOUT_MS / 1000)
+                except queue.Empty:
+                    continue
+                writer.write(device, data, t_ns)
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join(RECORD_DEVICE_TIMEOUT_S)
+        while not reports.empty():
+            writer.write(*reports.get())
+    return writer.records
@@ -0,0 +1,234 @@
+import mmap
+import struct
+import time
+
+# Formato .hidtrace: cabeçalho fixo + registros de tamanho fixo
+#   cabeçalho: magic, versão, largura do payload, reservado, início (epoch)
+#   registro:  delta desde o registro anterior (us), controle, tamanho real, payload
+MAGIC = b'HIDT'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHd')
+RECORD_HEAD = struct.Struct('<IBB')
+MAX_DELTA_US = 0xFFFFFFFF
+# Largura para vários controles no mesmo arquivo: o maior relatório lido do HID
+# (READ_SIZE em engines/reportrate.py). Sem largura, o primeiro relatório decide, o que só
+# serve para um controle.
+MULTI_DEVICE_WIDTH = 64
+
+
+class CaptureWriter:
+    def __init__(self, path, width=None):
+        self.path = path
+        self.width = width
+        self.file = open(path, 'wb')
+        self.record = None
+        self.last_ns = None
+        self.records = 0
+        self.truncated = 0
+        if width is not None:
+            self.write_header()
+
+    def write_header(self):
+        self.width = min(self.width, 255)
+        self.record = struct.Struct(f'<IBB{self.width}s')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.width, 0, time.time()))
+
+    def write(self, device, report, t_ns=None):
+        if t_ns is None:
+            t_ns = time.perf_counter_ns()
+        if self.record is None:
+            # Sem largura definida, usa o tamanho do primeiro relatório
+            self.width = len(report)
+            self.write_header()
+        if self.last_ns is None:
+            self.last_ns = t_ns
+        delta_us = min(max((t_ns - self.last_ns) // 1000, 0), MAX_DELTA_US)
+        # Avança só o que foi gravado, para os arredondamentos não se acumularem
+        self.last_ns += delta_us * 1000
+
+        length = len(report)
+        if length > self.width:
+            self.truncated += 1
+            length = self.width
+        self.file.write(self.record.pack(delta_us, device, length, bytes(report[:length])))
+        self.records += 1
+
+    def close(self):
+        if self.record is None and self.width is None:
+            # Nada foi gravado: ainda assim deixa um arquivo válido e vazio
+            self.width = 0
+            self.write_header()
+        self.file.close()
+        if self.truncated:
+            print(f"Warning: {self.truncated} reports longer than {self.width} bytes were cut short in {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, _, self.started = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} HID trace")
+        self.record_size = RECORD_HEAD.size + self.width
+        self.count = (len(self.map) - HEADER.size) // self.record_size
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, index):
+        return HEADER.size + index * self.record_size
+
+    def read(self, index):
+        offset = self.offset(index)
+        delta_us, device, length = RECORD_HEAD.unpack_from(self.map, offset)
+        start = offset + RECORD_HEAD.size
+        return delta_us, device, list(self.map[start:start + length])
+
+    def __iter__(self):
+        # (instante em ns desde o início, controle, relatório), lido direto do mmap
+        t_ns = 0
+        for index in range(self.count):
+            delta_us, device, report = self.read(index)
+            t_ns += delta_us * 1000
+            yield t_ns, device, report
+
+    def devices(self):
+        # Só o byte do controle de cada registro, sem carregar os payloads
+        if not self.count:
+            return []
+        first = HEADER.size + 4
+        return sorted(set(self.map[first:first + self.count * self.record_size:self.record_size]))
+
+    def duration_s(self):
+        total_us = 0
+        for index in range(self.count):
+            total_us += RECORD_HEAD.unpack_from(self.map, self.offset(index))[0]
+        return total_us / 1e6
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayDevice:
+    def __init__(self, replay):
+        self.replay = replay
+        self.device = None
+        self.index = 0
+        self.t_ns = 0
+        self.nonblocking = False
+        self.pending = None
+        self.finished = False
+
+    def open_path(self, path):
+        self.device = self.replay.find(path)
+
+    def set_nonblocking(self, enabled):
+        self.nonblocking = bool(enabled)
+        return 0
+
+    def next_record(self):
+        # Cada controle percorre o arquivo só atrás dos próprios registros
+        reader = self.replay.reader
+        while self.index < reader.count:
+            delta_us, device, report = reader.read(self.index)
+            self.t_ns += delta_us * 1000
+            self.index += 1
+            if device == self.device:
+                return self.t_ns, report
+        return None, None
+
+    def read(self, max_length, timeout_ms=0):
+        if self.device is None:
+            raise IOError('read error: device not open')
+        if self.finished:
+            if timeout_ms > 0 and not self.nonblocking:
+                time.sleep(timeout_ms / 1000)
+            return []
+
+        if self.replay.started is None:
+            self.replay.started = time.perf_counter()
+        if self.pending is None:
+            self.pending = self.next_record()
+        t_ns, report = self.pending
+        if report is None:
+            self.finished = True
+            return []
+
+        if self.replay.speed > 0:
+            due = self.replay.started + t_ns / 1e9 / self.replay.speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                if timeout_ms > 0:
+                    wait = min(wait, timeout_ms / 1000)
+                elif self.nonblocking:
+                    return []
+                time.sleep(wait)
+                if time.perf_counter() < due:
+                    return []
+
+        self.pending = self.next_record()
+        return report[:max_length]
+
+    def close(self):
+        self.device = None
+
+
+class ReplayHID:
+    # Backend HID (ver engines/hidbackend.py) que toca um .hidtrace gravado.
+    # speed=1 mantém o ritmo original, 10 é dez vezes mais rápido, 0 é sem espera.
+    def __init__(self, path, speed=1.0):
+        self.reader = CaptureReader(path)
+        self.device_ids = self.reader.devices()
+        self.speed = speed
+        self.started = None
+        self.opened = []
+
+    def path(self, device):
+        return f'replay:{device}'.encode()
+
+    def find(self, path):
+        for device in self.device_ids:
+            if self.path(device) == path:
+                return device
+        raise IOError(f'open failed: {path!r}')
+
+    def enumerate(self, vendor_id=0, product_id=0):
+        return [{
+            'path': self.path(device),
+            'vendor_id': 0,
+            'product_id': 0,
+            'serial_number': f'REPLAY{device}',
+            'release_number': 0,
+            'manufacturer_string': 'Replay',
+            'product_string': f'Replay Controller {device}',
+            'usage_page': 0x01,
+            'usage': 0x05,
+            'interface_number': 0,
+        } for device in self.device_ids]
+
+    def device(self):
+        device = ReplayDevice(self)
+        self.opened.append(device)
+        return device
+
+    def finished(self):
+        return bool(self.opened) and all(device.finished for device in self.opened)
+
+    def close(self):
+        self.reader.close()
@@ -1,9 +1,14 @@
 import sys
-import hid
 import time
-import json
+import threading
+import collections
 from pathlib import Path
 from .controllerGetter import detect_controllers
+from .decoder import axis_entry
+from .events import CalibrationStep, ErrorEvent, Started, Stopped, bus
+from .hidbackend import get_hid
+from .profiles import ProfileStore, identity_key, load_profiles, migrate_legacy
+from .settings import DEFAULT_MAX_PLAYERS, load_settings, settings_path_for
 
 def get_path_profile() -> Path:
     if getattr(sys, 'frozen', False):
@@ -16,120 +21,277 @@ PATH_JSON = get_path_profile()
 BUTTONS_TO_MAP = ['up', 'down', 'left', 'right', 'A', 'B', 'X', 'Y', 'L', 'R', 'select', 'start']
 is_running = True
 
-def start_multiplayer_calibration():
+# 'parallel' calibra todos os controles ao mesmo tempo, cada um na sua thread;
+# 'sequential' faz um jogador por vez
+CALIBRATION_MODE = 'parallel'
+READ_TIMEOUT_MS = 50
+
+# O repouso é aceito assim que, em cada byte, o valor mais comum aparece em pelo menos
+# IDLE_AGREEMENT das últimas IDLE_WINDOW leituras, em vez de depois de uma espera fixa
+IDLE_WINDOW = 16
+IDLE_AGREEMENT = 0.9
+IDLE_MIN_S = 0.3
+# Controles que só mandam relatório quando algo muda: silêncio também é repouso
+IDLE_QUIET_S = 0.3
+IDLE_TIMEOUT_S = 5.0
+# Tempo que o byte precisa ficar em repouso para o botão contar como solto
+RELEASE_SETTLE_S = 0.05
+
+# Byte que repousa perto do meio e vai até uma das pontas é um eixo (D-pad analógico,
+# stick), gravado com centro, curso, zona morta e histerese em vez de máscara de bits
+AXIS_CENTER_MIN = 96
+AXIS_CENTER_MAX = 160
+AXIS_EDGE = 32
+
+# Modelo já conhecido: confere só estes botões contra o perfil salvo
+VERIFY_BUTTONS = ('A', 'start', 'up')
+VERIFY_TIMEOUT_S = 10.0
+
+
+def stable_idle(window, agreement=IDLE_AGREEMENT):
+    length = min(len(report) for report in window)
+    idle_state = []
+    idle_values = []
+    for index in range(length):
+        counts = collections.Counter(report[index] for report in window)
+        value, count = counts.most_common(1)[0]
+        if count < agreement * len(window):
+            return None
+        idle_state.append(value)
+        # Valores repetidos em repouso também contam como repouso (ruído de analógico);
+        # um valor visto uma vez só pode ser um toque e não entra
+        idle_values.append({seen for seen, times in counts.items() if times > 1 or seen == value})
+    return idle_state, idle_values
+
+
+def capture_idle(gamepad):
+    window = collections.deque(maxlen=IDLE_WINDOW)
+    started = time.perf_counter()
+    last_report = started
+    while is_running:
+        data = gamepad.read(64, READ_TIMEOUT_MS)
+        now = time.perf_counter()
+        if data:
+            window.append(data)
+            last_report = now
+        if now - started < IDLE_MIN_S:
+            continue
+        if len(window) == IDLE_WINDOW:
+            idle = stable_idle(window)
+            if idle:
+                return idle
+        elif window and now - last_report >= IDLE_QUIET_S:
+            return stable_idle([window[-1]])
+        if now - started > IDLE_TIMEOUT_S:
+            # Nunca estabilizou (byte analógico ruidoso): fica com o valor mais comum de cada byte
+            return stable_idle(window, agreement=0) if window else None
+    return None
+
+
+def wait_for_press(gamepad, idle_state, idle_values):
+    while is_running:
+        data = gamepad.read(64, READ_TIMEOUT_MS)
+        for index in range(min(len(data), len(idle_state))):
+            if data[index] not in idle_values[index]:
+                return index, data[index]
+    return None
+
+
+def wait_for_release(gamepad, is_released, on_report=None):
+    # Sem sleep fixo: solto quando o estado ficou em repouso por RELEASE_SETTLE_S
+    released_at = None
+    while is_running:
+        data = gamepad.read(64, READ_TIMEOUT_MS)
+        now = time.perf_counter()
+        if data:
+            if on_report is not None:
+                on_report(data)
+            if is_released(data):
+                if released_at is None:
+                    released_at = now
+            else:
+                released_at = None
+        if released_at is not None and now - released_at >= RELEASE_SETTLE_S:
+            return True
+    return False
+
+
+def is_axis(center, extreme):
+    return AXIS_CENTER_MIN <= center <= AXIS_CENTER_MAX and (extreme <= AXIS_EDGE or extreme >= 255 - AXIS_EDGE)
+
+
+def verify_profile(player_id, gamepad, decoder, idle_state):
+    if decoder.decode(idle_state) != decoder.idle_pressed:
+        return False
+    for button in VERIFY_BUTTONS:
+        if button not in decoder.bits:
+            continue
+        print(f"[PLAYER {player_id + 1}] Known model. PRESS: [{button.upper()}] to confirm its saved profile")
+        bus.publish(CalibrationStep(player_id, button, 'verify'))
+        deadline = time.perf_counter() + VERIFY_TIMEOUT_S
+        pressed = 0
+        while is_running and not pressed:
+            if time.perf_counter() > deadline:
+                return False
+            data = gamepad.read(64, READ_TIMEOUT_MS)
+            if data:
+                pressed = decoder.decode(data) & ~decoder.idle_pressed
+        if pressed != decoder.bits[button]:
+            return False
+        if not wait_for_release(gamepad, lambda data: decoder.decode(data) == decoder.idle_pressed):
+            return False
+    return is_running
+
+
+def calibrate_controller(player_id, target_controller, store, store_lock):
+    print(f"\n--- SETTING UP PLAYER {player_id + 1} ---")
+    print(f"Device: {target_controller['name']}")
+    bus.publish(CalibrationStep(player_id, None, 'player'))
+
+    gamepad = None
+    try:
+        gamepad = get_hid().device()
+        gamepad.open_path(target_controller['path'])
+        gamepad.set_nonblocking(False)
+
+        print(f"[PLAYER {player_id + 1}] Please DO NOT touch any buttons on this controller.")
+        idle = capture_idle(gamepad)
+        if idle is None:
+            if is_running:
+                print(f"Failed to read data for Player {player_id + 1}. Skipping.")
+            return
+        idle_state, idle_values = idle
+
+        print(f"Player {player_id + 1} Idle state captured!\n")
+        bus.publish(CalibrationStep(player_id, None, 'idle'))
+
+        with store_lock:
+            decoder = store.decoder(target_controller)
+            known_profile = store.profile(target_controller)
+        if decoder is not None:
+            if verify_profile(player_id, gamepad, decoder, idle_state):
+                with store_lock:
+                    store.put(target_controller, known_profile)
+                print(f"Player {player_id + 1} matches a saved profile. Calibration skipped.")
+                bus.publish(CalibrationStep(player_id, None, 'verified'))
+                return
+            if not is_running:
+                return
+            print(f"Player {player_id + 1} does not match the saved profile. Calibrating all buttons.")
+
+        player_profile = {}
+
+        for button in BUTTONS_TO_MAP:
+            if not is_running: break
+
+            print(f"[PLAYER {player_id + 1}] PRESS AND HOLD: [{button.upper()}]")
+            bus.publish(CalibrationStep(player_id, button, 'hold'))
+
+            # Espera o botão ser pressionado (leitura bloqueante, sem polling)
+            pressed = wait_for_press(gamepad, idle_state, idle_values)
+            if pressed is None: break
+            target_index, pressed_value = pressed
+            center = idle_state[target_index]
+
+            print(f"[PLAYER {player_id + 1}] [{button.upper()}] mapped successfully!")
+            print(f"[PLAYER {player_id + 1}] RELEASE the button...")
+            bus.publish(CalibrationStep(player_id, button, 'release'))
+
+            # Enquanto segura, guarda o ponto mais longe do centro (curso de um eixo analógico)
+            extreme = [pressed_value]
+            def track(data):
+                if len(data) > target_index and abs(data[target_index] - center) > abs(extreme[0] - center):
+                    extreme[0] = data[target_index]
+
+            # Espera o botão ser solto (Olhando APENAS para o índice mapeado)
+            idle_at_index = idle_values[target_index]
+            wait_for_release(
+                gamepad, lambda data: len(data) > target_index and data[target_index] in idle_at_index, track
+            )
+
+            if is_axis(center, extreme[0]):
+                noise = max(abs(value - center) for value in idle_at_index)
+                player_profile[button] = axis_entry(target_index, center, extreme[0], noise)
+            else:
+                player_profile[button] = {
+                    "index": target_index,
+                    "idle_value": center,
+                    "mask": pressed_value ^ center
+                }
+
+        if is_running:
+            with store_lock:
+                store.put(target_controller, player_profile)
+
+    except Exception as e:
+        print(f"Error setting up Player {player_id + 1}: {e}")
+        bus.publish(ErrorEvent('calibration', 'device', f"Player {player_id + 1}: {e}"))
+    finally:
+        if gamepad is not None:
+            gamepad.close()
+
+
+def start_multiplayer_calibration(mode=None, players=None):
     global is_running
     is_running = True
+    mode = mode or CALIBRATION_MODE
     
     print("=======================================")
     print("  Universal Multiplayer Calibration  ")
     print("=======================================\n")
+    bus.publish(Started('calibration'))
 
     controllers = detect_controllers()
     if not controllers:
         print("No controllers found. Please connect them and try again.")
+        bus.publish(ErrorEvent('calibration', 'no_controllers', "No controllers found"))
         return
 
-    controllers_to_map = controllers[:2]
+    try:
+        max_players = players or load_settings(settings_path_for(PATH_JSON))['max_players']
+    except ValueError as ex:
+        # Calibrar não usa as teclas: um settings.json com erro não impede
+        print(f"Warning: {ex}. Calibrating up to {DEFAULT_MAX_PLAYERS} controllers.")
+        max_players = DEFAULT_MAX_PLAYERS
+    controllers_to_map = controllers[:max_players]
 
-    all_profiles = []
-    if PATH_JSON.exists():
-        try:
-            with open(PATH_JSON) as f:
-                all_profiles = json.load(f)
-        except (json.JSONDecodeError, OSError):
-            all_profiles = []
+    try:
+        store = load_profiles(PATH_JSON)
+    except (ValueError, OSError) as ex:
+        print(f"Could not read {PATH_JSON} ({ex}). Starting with empty profiles.")
+        store = ProfileStore(PATH_JSON)
+    migrate_legacy(store, controllers)
+    store_lock = threading.Lock()
 
+    workers = []
     for player_id, target_controller in enumerate(controllers_to_map):
         if not is_running: break
 
-        if player_id < len(all_profiles) and all_profiles[player_id]:
-            print(f"\n--- PLAYER {player_id + 1} already calibrated, skipping. ---")
+        # Este mesmo controle já tem perfil: nada a fazer. Um do mesmo modelo
+        # é só conferido com alguns botões (ver verify_profile)
+        if identity_key(target_controller) in store.by_identity:
+            print(f"\n--- PLAYER {player_id + 1} already calibrated ({target_controller['name']}), skipping. ---")
+            bus.publish(CalibrationStep(player_id, None, 'skipped'))
             continue
 
-        print(f"\n--- SETTING UP PLAYER {player_id + 1} ---")
-        print(f"Device: {target_controller['name']}")
-        
-        gamepad = None
-        try:
-            gamepad = hid.device()
-            gamepad.open_path(target_controller['path'])
-            gamepad.set_nonblocking(True)
-            
-            print("Please DO NOT touch any buttons on this controller.")
-            print("Reading idle state in 3 seconds...\n")
-            time.sleep(3)
-
-            idle_state = []
-            for _ in range(10):
-                data = gamepad.read(64)
-                if data: idle_state = data
-                time.sleep(0.05)
-                
-            if not idle_state:
-                print(f"Failed to read data for Player {player_id + 1}. Skipping.")
-                continue
-
-            print(f"Player {player_id + 1} Idle state captured!\n")
-            player_profile = {}
-
-            for button in BUTTONS_TO_MAP:
-                if not is_running: break
-                
-                print(f"[PLAYER {player_id + 1}] PRESS AND HOLD: [{button.upper()}]")
-                button_data = None
-                target_index = None # Guarda ONDE a mudança aconteceu
-                
-                # Espera o botão ser pressionado
-                while is_running:
-                    current_data = gamepad.read(64)
-                    if current_data and current_data != idle_state:
-                        for index, idle_val in enumerate(idle_state):
-                            if current_data[index] != idle_val:
-                                target_index = index
-                                changed_mask = current_data[index] ^ idle_val
-                                player_profile[button] = {
-                                    "index": index,
-                                    "idle_value": idle_state[index],
-                                    "mask": changed_mask
-                                }
-                                button_data = current_data
-                                break
-                    if button_data:
-                        break
-                    time.sleep(0.01)
-
-                if not is_running: break
-
-                print(f"[{button.upper()}] mapped successfully!")
-                print(f"RELEASE the button and wait...")
-                
-                # Espera o botão ser solto (Olhando APENAS para o índice mapeado)
-                while is_running:
-                    current_data = gamepad.read(64)
-                    if current_data and len(current_data) > target_index:
-                        # Se o índice exato voltou ao valor idle, consideramos solto!
-                        if current_data[target_index] == idle_state[target_index]:
-                            time.sleep(0.5) # Dá meio segundo pro usuário respirar
-                            break
-                    time.sleep(0.01)
-                    
-                print("-" * 30)
-
-            while len(all_profiles) <= player_id:
-                all_profiles.append({})
-            all_profiles[player_id] = player_profile
-
-        except Exception as e:
-            print(f"Error setting up Player {player_id + 1}: {e}")
-        finally:
-            if gamepad is not None:
-                gamepad.close()
+        if mode == 'parallel':
+            worker = threading.Thread(
+                target=calibrate_controller, args=(player_id, target_controller, store, store_lock), daemon=True
+            )
+            worker.start()
+            workers.append(worker)
+        else:
+            calibrate_controller(player_id, target_controller, store, store_lock)
+
+    for worker in workers:
+        worker.join()
 
     if is_running: # Só salva se a pessoa não apertou Stop no meio do caminho
-        with open(PATH_JSON, 'w') as json_file:
-            json.dump(all_profiles, json_file, indent=4)
+        store.save()
         print(f"Path saved in {PATH_JSON}")
         print("\nAll connected controllers calibrated!")
         print("Profiles saved as 'profiles.json'. You can now press Start Translator")
+        bus.publish(CalibrationStep(None, None, 'done'))
     else:
-        print("\nCalibration stopped by user.")
\ No newline at end of file
+        print("\nCalibration stopped by user.")
+        bus.publish(Stopped('calibration'))
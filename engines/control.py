@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import socket
+import tempfile
+import threading
+import socketserver
+from . import translator
+from .controllerGetter import detect_controllers
+from .events import ErrorEvent, Ready, Stopped
+from .outputs import BACKENDS
+from .profiles import load_profiles
+
+# Socket Unix local para controlar um tradutor rodando como serviço.
+# Protocolo: uma linha JSON por pedido, uma linha JSON por resposta, na mesma conexão.
+#   -> {"cmd": "stats"}
+#   <- {"ok": true, "result": {...}}      ou      {"ok": false, "error": "..."}
+# Comandos: status, start, stop, reload, devices, stats, shutdown
+# "start" aceita opcionalmente "mode", "backend", "players" e "stats_path".
+CONTROL_SOCKET = os.path.join(tempfile.gettempdir(), 'universal-gamepad.sock')
+MAX_REQUEST = 64 * 1024
+STOP_TIMEOUT_S = 5.0
+START_OPTIONS = ('mode', 'backend', 'players', 'stats_path')
+
+
+class CommandError(Exception):
+    pass
+
+
+def start_options(options):
+    # Confere as opções de um "start" antes de criar a thread: um valor errado não pode
+    # virar um tradutor que morre logo depois de começar
+    unknown = [key for key in options if key not in START_OPTIONS]
+    if unknown:
+        raise CommandError(f"unknown start option '{unknown[0]}'. Options: {', '.join(START_OPTIONS)}")
+    options = {key: value for key, value in options.items() if value is not None}
+    if 'mode' in options and options['mode'] not in translator.READER_MODES:
+        raise CommandError(f"unknown mode '{options['mode']}'. Options: {', '.join(translator.READER_MODES)}")
+    if 'backend' in options and options['backend'] not in BACKENDS:
+        raise CommandError(f"unknown backend '{options['backend']}'. Options: {', '.join(BACKENDS)}")
+    players = options.get('players')
+    # bool é int em Python, mas "players": true não é um número de jogadores
+    if 'players' in options and (not isinstance(players, int) or isinstance(players, bool) or players < 1):
+        raise CommandError(f"players must be a positive integer, got {players!r}")
+    if 'stats_path' in options and (not isinstance(options['stats_path'], str) or not options['stats_path']):
+        raise CommandError(f"stats_path must be a file path, got {options['stats_path']!r}")
+    return options
+
+
+def device_info(device):
+    path = device['path']
+    return {
+        'path': path.decode(errors='replace') if isinstance(path, bytes) else str(path),
+        'name': device['name'],
+        'vendor_id': device.get('vendor_id'),
+        'product_id': device.get('product_id'),
+        'serial_number': device.get('serial_number'),
+        'interface_number': device.get('interface_number'),
+    }
+
+
+class TranslatorService:
+    # Dono da thread do tradutor; os pedidos do socket chegam em threads próprias
+    def __init__(self, **options):
+        # Padrões do serviço (cli.py serve); cada "start" pode trocar alguns só para aquela vez
+        self.options = start_options(options)
+        self.run_options = dict(self.options)
+        self.lock = threading.Lock()
+        self.worker = None
+        self.started_at = None
+        self.ready_ms = None
+        self.last_error = None
+        self.shutdown_requested = threading.Event()
+
+    def running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def handle_event(self, event):
+        # Chamado por quem drena o bus (ver cli.py serve)
+        if isinstance(event, Ready):
+            self.ready_ms = round((event.t_ns - self.started_at) / 1e6, 1)
+        elif isinstance(event, ErrorEvent):
+            self.last_error = {'kind': event.kind, 'message': event.message}
+        elif isinstance(event, Stopped):
+            self.ready_ms = None
+
+    def start(self, **options):
+        with self.lock:
+            if self.running():
+                raise CommandError("translator is already running")
+            self.run_options = dict(self.options, **start_options(options))
+            self.last_error = None
+            self.ready_ms = None
+            self.started_at = time.perf_counter_ns()
+            self.worker = threading.Thread(target=translator.start_translator, kwargs=dict(self.run_options),
+                                           daemon=True)
+            self.worker.start()
+        return self.status()
+
+    def stop(self):
+        with self.lock:
+            worker = self.worker
+            if worker is None or not worker.is_alive():
+                raise CommandError("translator is not running")
+            deadline = time.monotonic() + STOP_TIMEOUT_S
+            # Repete o pedido: um Stop que chega antes do loop começar seria desfeito pelo start_translator
+            while worker.is_alive() and time.monotonic() < deadline:
+                translator.stop_translator()
+                worker.join(0.1)
+            if worker.is_alive():
+                raise CommandError(f"translator did not stop within {STOP_TIMEOUT_S:.0f} s")
+        return self.status()
+
+    def reload(self):
+        # Confere o profiles.json e, com o tradutor rodando, troca os perfis sem parar (hot-reload)
+        try:
+            store = load_profiles(translator.PATH_JSON)
+        except (ValueError, OSError) as ex:
+            raise CommandError(f"could not read {translator.PATH_JSON} ({ex})")
+        reloaded = self.running() and translator.reload_profiles()
+        return {'profiles': len(store), 'reloaded': reloaded}
+
+    def devices(self):
+        try:
+            store = load_profiles(translator.PATH_JSON)
+        except (ValueError, OSError):
+            store = None
+        controllers = detect_controllers()
+        decoders = store.match(controllers) if store is not None else [None] * len(controllers)
+        active = {device['path'] for device in translator.active_devices} if self.running() else set()
+        result = []
+        for controller, decoder in zip(controllers, decoders):
+            info = device_info(controller)
+            info['calibrated'] = decoder is not None
+            info['active'] = controller['path'] in active
+            result.append(info)
+        return result
+
+    def stats(self):
+        if translator.stats is None:
+            raise CommandError("translator has not run yet")
+        snapshot = translator.stats.snapshot()
+        for entry, counters in zip(snapshot['players'], translator.input_stats):
+            entry['input'] = {'reports': counters.reports, 'dropped': counters.dropped, 'merged': counters.merged}
+        return snapshot
+
+    def status(self):
+        running = self.running()
+        return {
+            'running': running,
+            'ready_ms': self.ready_ms if running else None,
+            'players': [device_info(device) for device in translator.active_devices] if running else [],
+            'options': self.run_options if running else self.options,
+            'profiles': str(translator.PATH_JSON),
+            'last_error': self.last_error,
+        }
+
+    def shutdown(self):
+        self.shutdown_requested.set()
+        return {'running': self.running()}
+
+    def execute(self, request):
+        commands = {
+            'status': self.status,
+            'start': self.start,
+            'stop': self.stop,
+            'reload': self.reload,
+            'devices': self.devices,
+            'stats': self.stats,
+            'shutdown': self.shutdown,
+        }
+        if not isinstance(request, dict) or request.get('cmd') not in commands:
+            raise CommandError(f"unknown command. Options: {', '.join(commands)}")
+        args = {key: value for key, value in request.items() if key != 'cmd'}
+        if request['cmd'] != 'start' and args:
+            raise CommandError(f"'{request['cmd']}' takes no arguments")
+        return commands[request['cmd']](**args)
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST + 1)
+            if not line:
+                break
+            if len(line) > MAX_REQUEST:
+                self.reply({'ok': False, 'error': "request too long"})
+                break
+            try:
+                result = self.server.service.execute(json.loads(line))
+                response = {'ok': True, 'result': result}
+            except (CommandError, TypeError) as ex:
+                response = {'ok': False, 'error': str(ex)}
+            except json.JSONDecodeError as ex:
+                response = {'ok': False, 'error': f"invalid JSON ({ex})"}
+            except IOError as ex:
+                response = {'ok': False, 'error': f"device error ({ex})"}
+            self.reply(response)
+
+    def reply(self, response):
+        self.wfile.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        self.service = service
+        remove_stale_socket(path)
+        # Só o próprio usuário conecta no socket
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, ControlHandler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def remove_stale_socket(path):
+    # Um socket largado por um serviço que morreu é apagado; um que ainda responde não
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"another translator service is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def send_command(cmd, path=CONTROL_SOCKET, timeout=STOP_TIMEOUT_S + 5, **args):
+    # Cliente mínimo: um pedido, uma resposta. Devolve o dicionário da resposta.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(json.dumps(dict(args, cmd=cmd)).encode() + b'\n')
+        with client.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError(f"{path} closed the connection without a reply")
+    return json.loads(line)
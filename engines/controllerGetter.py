@@ -1,28 +1,95 @@
-import hid
+import time
+import threading
+from .hidbackend import get_hid
 
-def detect_controllers():
-    connected_devices = hid.enumerate()
-    keywords = ['gamepad', 'joystick', 'controller', 'snes', 'retrolink']
-    
+# Um controle é reconhecido, nesta ordem:
+#   1. pelo usage do HID: Generic Desktop (0x01) / Joystick, Game Pad ou Multi-axis
+#   2. se o sistema não informa usage (usage_page 0, ex.: hidapi via libusb), pela
+#      tabela de vendor/product ID conhecidos ou por palavra-chave no nome
+GENERIC_DESKTOP = 0x01
+GAME_USAGES = {(GENERIC_DESKTOP, 0x04), (GENERIC_DESKTOP, 0x05), (GENERIC_DESKTOP, 0x08)}
+
+# (vendor_id, product_id) -> nome usado quando o controle não informa product_string
+KNOWN_CONTROLLERS = {
+    (0x0079, 0x0006): 'DragonRise Generic USB Joystick',
+    (0x0079, 0x0011): 'DragonRise SNES Gamepad',
+    (0x0583, 0x2060): 'iBuffalo SNES Classic USB Gamepad',
+    (0x0810, 0x0001): 'Generic USB Gamepad',
+    (0x0810, 0xE501): 'Generic SNES USB Gamepad',
+    (0x12BD, 0xD015): 'Generic SNES USB Gamepad',
+    (0x1C59, 0x0026): 'Retrolink SNES Controller',
+    (0x045E, 0x028E): 'Xbox 360 Controller',
+    (0x045E, 0x02EA): 'Xbox One Controller',
+    (0x054C, 0x05C4): 'DualShock 4',
+    (0x054C, 0x09CC): 'DualShock 4 (v2)',
+    (0x054C, 0x0CE6): 'DualSense',
+    (0x057E, 0x2009): 'Switch Pro Controller',
+    (0x2DC8, 0x6101): '8BitDo SN30 Pro',
+}
+KEYWORDS = ('gamepad', 'joystick', 'controller', 'snes', 'retrolink')
+
+# Resultado da última enumeração, dividido por todo mundo (interface, supervisores,
+# calibração) por ENUMERATION_TTL_S: um hid.enumerate() por vez, não um por chamador
+ENUMERATION_TTL_S = 0.25
+_cache_lock = threading.Lock()
+_cache = None
+
+
+def is_controller(device):
+    usage_page = device.get('usage_page') or 0
+    if usage_page:
+        return (usage_page, device.get('usage') or 0) in GAME_USAGES
+    if (device.get('vendor_id') or 0, device.get('product_id') or 0) in KNOWN_CONTROLLERS:
+        return True
+    product_name = (device.get('product_string') or '').lower()
+    return any(word in product_name for word in KEYWORDS)
+
+
+def scan_controllers(connected_devices):
     found_controllers = []
-    
+    seen_paths = set()
+
     for device in connected_devices:
-        product_name = device.get('product_string', '')
-        if product_name is None:
+        if not is_controller(device):
             continue
-            
-        product_name = product_name.lower()
-        
-        # Se achar a palavra-chave, salva o PATH (Caminho Físico)
-        if any(word in product_name for word in keywords):
-            usb_path = device['path']
-            real_name = device.get('product_string', 'Uknown Controller')
-            
-            # Evita adicionar o mesmo controle duas vezes (as vezes o Mac lista interfaces duplicadas)
-            if usb_path not in [c['path'] for c in found_controllers]:
-                found_controllers.append({
-                    'path': usb_path,
-                    'name': real_name
-                })
+        usb_path = device['path']
+        # Evita adicionar o mesmo controle duas vezes (as vezes o Mac lista interfaces duplicadas)
+        if usb_path in seen_paths:
+            continue
+        seen_paths.add(usb_path)
+
+        vendor_id = device.get('vendor_id') or 0
+        product_id = device.get('product_id') or 0
+        real_name = device.get('product_string') or KNOWN_CONTROLLERS.get((vendor_id, product_id), 'Unknown Controller')
+        found_controllers.append({
+            'path': usb_path,
+            'name': real_name,
+            # Identidade do controle: é por ela que o perfil é achado (engines/profiles.py)
+            'vendor_id': vendor_id,
+            'product_id': product_id,
+            'serial_number': device.get('serial_number') or '',
+            'interface_number': device.get('interface_number', -1),
+            'usage_page': device.get('usage_page') or 0,
+            'usage': device.get('usage') or 0,
+        })
 
     return found_controllers
+
+
+def detect_controllers(max_age=ENUMERATION_TTL_S):
+    # max_age=0 força uma enumeração nova
+    global _cache
+    backend = get_hid()
+    with _cache_lock:
+        now = time.monotonic()
+        if _cache is not None and _cache[1] is backend and now - _cache[0] <= max_age:
+            return list(_cache[2])
+        found_controllers = scan_controllers(backend.enumerate())
+        _cache = (time.monotonic(), backend, found_controllers)
+    return list(found_controllers)
+
+
+def clear_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,137 @@
+import math
+from .decoder import iter_bits
+
+# Filtro de repique por botão, aplicado ao bitmask já decodificado de um jogador:
+#   mode 'time':    a mudança só vale depois de 'ms' sem o botão voltar atrás
+#   mode 'reports': a mudança só vale depois de 'reports' relatórios seguidos iguais
+# Em qualquer modo, uma mudança que continua de pé há 'budget_ms' é aceita:
+# o filtro nunca atrasa uma tecla mais do que isso.
+DEBOUNCE_MODES = ('time', 'reports')
+DEFAULT_DEBOUNCE = {'mode': None, 'ms': 5, 'reports': 2, 'budget_ms': 10, 'buttons': {}}
+
+
+class Debouncer:
+    def __init__(self, buttons, mode='time', ms=5, reports=2, budget_ms=10, overrides=None):
+        if mode not in DEBOUNCE_MODES:
+            raise ValueError(f"Unknown debounce mode '{mode}'. Options: {', '.join(DEBOUNCE_MODES)}")
+        overrides = overrides or {}
+        self.buttons = buttons
+        self.mode = mode
+        self.budget_ns = int(budget_ms * 1e6)
+        # Janela e contagem por botão; a janela nunca passa do orçamento de latência
+        self.window_ns = [min(int(overrides.get(button, {}).get('ms', ms) * 1e6), self.budget_ns) for button in buttons]
+        self.reports = [overrides.get(button, {}).get('reports', reports) for button in buttons]
+        self.stable = 0
+        self.pending = 0
+        self.since = [0] * len(buttons)
+        self.started = [0] * len(buttons)
+        self.seen = [0] * len(buttons)
+        self.cancelled_at = [None] * len(buttons)
+        self.suppressed = [0] * len(buttons)
+        self.total_suppressed = 0
+        # Primeiro relatório da mudança mais antiga confirmada no último flush (para medir latência)
+        self.confirmed_from = None
+
+    def filter(self, raw, t_ns):
+        diff = raw ^ self.stable
+        if not diff and not self.pending:
+            return self.stable
+
+        # Voltou atrás antes de confirmar: um aperta/solta que não vira tecla
+        for bit in iter_bits(self.pending & ~diff):
+            self.suppressed[bit] += 1
+            self.total_suppressed += 1
+            self.cancelled_at[bit] = t_ns
+        for bit in iter_bits(diff & ~self.pending):
+            # Repique logo depois de outro: o orçamento continua contando da primeira mudança
+            cancelled_at = self.cancelled_at[bit]
+            if cancelled_at is None or t_ns - cancelled_at > self.window_ns[bit]:
+                self.started[bit] = t_ns
+            self.since[bit] = t_ns
+            self.seen[bit] = 0
+        for bit in iter_bits(diff):
+            self.seen[bit] += 1
+        self.pending = diff
+        return self.flush(t_ns)
+
+    def flush(self, t_ns):
+        # Confirma o que já venceu; também chamado sem relatório novo (ver next_deadline)
+        self.confirmed_from = None
+        for bit in iter_bits(self.pending):
+            if self.mode == 'reports':
+                ready = self.seen[bit] >= self.reports[bit]
+            else:
+                ready = t_ns - self.since[bit] >= self.window_ns[bit]
+            if ready or t_ns - self.started[bit] >= self.budget_ns:
+                self.stable ^= 1 << bit
+                self.pending ^= 1 << bit
+                if self.confirmed_from is None or self.started[bit] < self.confirmed_from:
+                    self.confirmed_from = self.started[bit]
+        return self.stable
+
+    def next_deadline(self):
+        # Quando a próxima mudança pendente vence, para controles que só mandam relatório quando algo muda
+        deadline = None
+        for bit in iter_bits(self.pending):
+            due = self.started[bit] + self.budget_ns
+            if self.mode == 'time':
+                due = min(due, self.since[bit] + self.window_ns[bit])
+            if deadline is None or due < deadline:
+                deadline = due
+        return deadline
+
+    def reset(self):
+        # Nova sessão do controle (reconexão, hot-reload): nada da anterior vale como histórico
+        count = len(self.buttons)
+        self.stable = 0
+        self.pending = 0
+        self.since = [0] * count
+        self.started = [0] * count
+        self.seen = [0] * count
+        self.cancelled_at = [None] * count
+        self.confirmed_from = None
+
+    def summary(self):
+        counts = ', '.join(f"{button}: {count}" for button, count in zip(self.buttons, self.suppressed) if count)
+        return f"{self.total_suppressed} bounces suppressed" + (f" ({counts})" if counts else "")
+
+
+def check_limits(config, where):
+    for key in ('ms', 'budget_ms'):
+        value = config.get(key)
+        if key in config and (not isinstance(value, (int, float)) or isinstance(value, bool)
+                              or not math.isfinite(value) or value < 0):
+            raise ValueError(f"{where}: '{key}' must be a number of 0 or more, got {value!r}")
+    value = config.get('reports')
+    if 'reports' in config and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+        raise ValueError(f"{where}: 'reports' must be a whole number of 1 or more, got {value!r}")
+
+
+def check_debounce(config, where):
+    # Confere um bloco "debounce" do settings.json (ver engines/settings.py): um erro de
+    # digitação vira ValueError dizendo onde, e não um filtro diferente do pedido
+    if not isinstance(config, dict):
+        raise ValueError(f"{where} must be an object, got {config!r}")
+    unknown = [key for key in config if key not in DEFAULT_DEBOUNCE]
+    if unknown:
+        raise ValueError(f"{where}: unknown field '{unknown[0]}'. Options: {', '.join(DEFAULT_DEBOUNCE)}")
+    if config.get('mode') and config['mode'] not in DEBOUNCE_MODES:
+        raise ValueError(f"{where}: unknown mode '{config['mode']}'. Options: {', '.join(DEBOUNCE_MODES)}")
+    check_limits(config, where)
+    buttons = config.get('buttons') or {}
+    if not isinstance(buttons, dict):
+        raise ValueError(f"{where}: 'buttons' must map button names to {{\"ms\": ...}}, got {buttons!r}")
+    for button, override in buttons.items():
+        if not isinstance(override, dict) or any(key not in ('ms', 'reports') for key in override):
+            raise ValueError(f"{where}: button '{button}' takes only 'ms' and 'reports', got {override!r}")
+        check_limits(override, f"{where} button '{button}'")
+
+
+def create_debouncer(buttons, config):
+    if not config or not config.get('mode'):
+        return None
+    return Debouncer(
+        buttons, config['mode'], config.get('ms', DEFAULT_DEBOUNCE['ms']),
+        config.get('reports', DEFAULT_DEBOUNCE['reports']), config.get('budget_ms', DEFAULT_DEBOUNCE['budget_ms']),
+        config.get('buttons'),
+    )
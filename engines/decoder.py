@@ -0,0 +1,133 @@
+# Eixos (D-pad analógico, sticks): aperta a partir de AXIS_DEADZONE do curso e só
+# solta abaixo de AXIS_DEADZONE - AXIS_HYSTERESIS, para o ruído perto do centro
+# e do limiar não virar uma enxurrada de aperta/solta
+AXIS_DEADZONE = 0.5
+AXIS_HYSTERESIS = 0.2
+AXIS_MAX_DEADZONE = 0.9
+
+
+class ProfileDecoder:
+    def __init__(self, buttons, length, idle, mask, lanes, idle_pressed, axes=()):
+        self.buttons = buttons
+        self.bits = {name: 1 << bit for bit, name in enumerate(buttons)}
+        self.length = length
+        self.idle = idle
+        self.mask = mask
+        self.lanes = lanes
+        self.idle_pressed = idle_pressed
+        # (deslocamento, tabela de aperto, tabela de segurar) por byte de eixo
+        self.axes = axes
+        # Bytes de repouso para completar relatórios mais curtos que o perfil
+        self.idle_report = list(idle.to_bytes(length, 'little'))
+
+    def decode(self, report, previous=0):
+        # previous é o bitmask decodificado do relatório anterior (histerese dos eixos)
+        if len(report) < self.length:
+            report = list(report) + self.idle_report[len(report):]
+
+        # O relatório inteiro vira um único int: XOR com o repouso, AND com as máscaras
+        value = int.from_bytes(report[:self.length], 'little')
+        changed = (value ^ self.idle) & self.mask
+        if not changed:
+            return self.idle_pressed
+
+        pressed = 0
+        for shift, table in self.lanes:
+            pressed |= table[(changed >> shift) & 0xFF]
+        for shift, press, hold in self.axes:
+            byte = (value >> shift) & 0xFF
+            pressed |= press[byte] | (hold[byte] & previous)
+        return pressed
+
+    def names(self, bits):
+        return [self.buttons[bit] for bit in iter_bits(bits)]
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def axis_entry(index, center, extreme, noise=0):
+    # Entrada de perfil para uma direção de eixo: range tem sinal (para onde o eixo vai)
+    travel = extreme - center
+    noise_share = noise / abs(travel)
+    deadzone = min(max(AXIS_DEADZONE, 2 * noise_share), AXIS_MAX_DEADZONE)
+    hysteresis = max(min(AXIS_HYSTERESIS, deadzone - noise_share), 0)
+    return {
+        'type': 'axis',
+        'index': index,
+        'idle_value': center,
+        'center': center,
+        'range': travel,
+        'deadzone': round(deadzone, 3),
+        'hysteresis': round(hysteresis, 3),
+    }
+
+
+def compile_axis(by_index):
+    axes = []
+    for idx, entries in sorted(by_index.items()):
+        press = [0] * 256
+        hold = [0] * 256
+        for bit, config in entries:
+            travel = abs(config['range'])
+            direction = 1 if config['range'] > 0 else -1
+            press_at = config['deadzone'] * travel
+            release_at = max((config['deadzone'] - config['hysteresis']) * travel, 1)
+            for value in range(256):
+                moved = (value - config['center']) * direction
+                if moved >= press_at:
+                    press[value] |= bit
+                if moved >= release_at:
+                    hold[value] |= bit
+        axes.append((8 * idx, press, hold))
+    return axes
+
+
+def compile_profile(profile):
+    buttons = tuple(profile.keys())
+    length = max((config['index'] + 1 for config in profile.values()), default=0)
+
+    # O repouso de cada byte vem do primeiro botão calibrado naquele índice
+    lane_idle = {}
+    by_index = {}
+    axis_by_index = {}
+    for bit, (button, config) in enumerate(profile.items()):
+        idx = config['index']
+        if config.get('type') == 'axis':
+            axis_by_index.setdefault(idx, []).append((1 << bit, config))
+            continue
+        lane_idle.setdefault(idx, config['idle_value'])
+        by_index.setdefault(idx, []).append((1 << bit, config['mask'], config['idle_value']))
+
+    idle = 0
+    mask = 0
+    lanes = []
+    idle_pressed = 0
+    for idx, entries in sorted(by_index.items()):
+        base = lane_idle[idx]
+        lane_mask = 0
+        table = [0] * 256
+        for value in range(256):
+            raw = value ^ base
+            for bit, button_mask, idle_value in entries:
+                if ((raw ^ idle_value) & button_mask) == button_mask:
+                    table[value] |= bit
+        for _, button_mask, _ in entries:
+            lane_mask |= button_mask
+
+        idle |= base << (8 * idx)
+        mask |= lane_mask << (8 * idx)
+        lanes.append((8 * idx, table))
+        idle_pressed |= table[0]
+
+    # Bytes de eixo entram inteiros na máscara: no centro exato o atalho de repouso vale
+    for idx, entries in axis_by_index.items():
+        if idx not in lane_idle:
+            idle |= entries[0][1]['center'] << (8 * idx)
+        mask |= 0xFF << (8 * idx)
+
+    return ProfileDecoder(buttons, length, idle, mask, lanes, idle_pressed, compile_axis(axis_by_index))
@@ -0,0 +1,197 @@
+import sys
+import time
+import threading
+import multiprocessing
+from pathlib import Path
+from .events import ErrorEvent
+from .shared import MAX_SLOTS, SharedState
+
+# Calibração e tradução num processo próprio: redesenho da interface, log e hid.enumerate()
+# do processo da interface não disputam mais o GIL com o loop quente.
+#   interface -> engine: (comando, opções) pelo Pipe: 'translate', 'calibrate', 'stop', 'stats', 'exit'
+#   engine -> interface: ('events', lista de eventos do bus), ('log', linhas do stdout), ('stats', ...)
+#   estado ao vivo (botões apertados, contadores, latência): memória compartilhada (engines/shared.py)
+# 'spawn' em todo sistema: o processo novo não herda nada do Tk
+ENGINE_START_METHOD = 'spawn'
+COMMAND_INTERVAL = 0.02
+LATENCY_INTERVAL = 1.0
+EXIT_TIMEOUT_S = 5.0
+
+
+class Channel:
+    # Connection não é thread-safe: o stdout da thread do engine e o loop principal mandam pelo mesmo Pipe
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.connection.send(message)
+
+
+class PipeWriter:
+    # stdout do processo do engine: linhas completas vão para o log da interface
+    def __init__(self, channel):
+        self.channel = channel
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        if '\n' in self.buffer:
+            lines, self.buffer = self.buffer.rsplit('\n', 1)
+            self.channel.send(('log', lines))
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def publish_latency(shared, stats):
+    for entry in stats.snapshot()['players']:
+        total = entry['total']
+        shared.write_latency(entry['player'] - 1, total['p50_us'], total['p99_us'],
+                             entry['reports_per_s'], entry['events_per_s'])
+
+
+def engine_main(connection, shared_name, profile_path=None, setup=None):
+    channel = Channel(connection)
+    sys.stdout = PipeWriter(channel)
+    from . import configurator, translator
+    from .events import bus
+    from .reportrate import devices_path_for
+    from .settings import settings_path_for
+    if profile_path:
+        translator.PATH_JSON = str(profile_path)
+        translator.SETTINGS_PATH = settings_path_for(profile_path)
+        translator.DEVICES_PATH = devices_path_for(profile_path)
+        configurator.PATH_JSON = Path(profile_path)
+    if setup is not None:
+        # Ajustes feitos no próprio processo do engine (benchmark: controles simulados)
+        function, *args = setup
+        function(*args)
+
+    shared = SharedState.attach(shared_name)
+    worker = None
+    stopping = False
+    last_latency = 0
+    running = True
+    while running:
+        if connection.poll(COMMAND_INTERVAL):
+            try:
+                command, options = connection.recv()
+            except EOFError:
+                # A interface fechou sem mandar 'exit'
+                command, options = 'exit', {}
+            busy = worker is not None and worker.is_alive()
+            if command in ('translate', 'calibrate'):
+                if busy:
+                    print("Engine busy: stop the current task first.")
+                else:
+                    target = translator.start_translator if command == 'translate' else configurator.start_multiplayer_calibration
+                    if command == 'translate':
+                        options = dict(options, shared=shared)
+                    worker = threading.Thread(target=target, kwargs=options, daemon=True)
+                    worker.start()
+            elif command == 'stop':
+                stopping = busy
+            elif command == 'stats':
+                channel.send(('stats', translator.stats, time.process_time()))
+            elif command == 'exit':
+                running = False
+                stopping = busy
+
+        # Um Stop que chega antes do loop começar seria desfeito: repete até a thread sair
+        if stopping:
+            if worker.is_alive():
+                configurator.is_running = False
+                translator.stop_translator()
+            else:
+                stopping = False
+        if not running and worker is not None:
+            worker.join(EXIT_TIMEOUT_S)
+
+        events = bus.drain()
+        if events:
+            channel.send(('events', events))
+        now = time.monotonic()
+        if translator.stats is not None and now - last_latency >= LATENCY_INTERVAL:
+            last_latency = now
+            publish_latency(shared, translator.stats)
+
+    shared.close()
+    connection.close()
+
+
+class EngineProcess:
+    def __init__(self, profile_path=None, setup=None, slots=MAX_SLOTS):
+        context = multiprocessing.get_context(ENGINE_START_METHOD)
+        self.shared = SharedState.create(slots)
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=engine_main, name='controller-engine', daemon=True,
+                                       args=(child_connection, self.shared.name, profile_path, setup))
+        self.process.start()
+        child_connection.close()
+        self.pending_events = []
+        self.pending_lines = []
+        self.exited = False
+
+    def send(self, command, **options):
+        try:
+            self.connection.send((command, options))
+        except OSError:
+            self.check_exit()
+
+    def translate(self, **options):
+        self.send('translate', **options)
+
+    def calibrate(self, **options):
+        self.send('calibrate', **options)
+
+    def stop(self):
+        self.send('stop')
+
+    def check_exit(self):
+        if not self.exited:
+            self.exited = True
+            message = f"Engine process exited (code {self.process.exitcode})"
+            self.pending_events.append(ErrorEvent('engine', 'engine', message))
+
+    def receive(self, message):
+        if message[0] == 'events':
+            self.pending_events.extend(message[1])
+        elif message[0] == 'log':
+            self.pending_lines.extend(line.strip() for line in message[1].split('\n') if line.strip())
+        elif message[0] == 'stats':
+            return message[1:]
+        return None
+
+    def poll(self):
+        # Chamado pela interface uma vez por frame: devolve (eventos, linhas de log) sem bloquear
+        try:
+            while self.connection.poll():
+                self.receive(self.connection.recv())
+        except (EOFError, OSError):
+            self.check_exit()
+        events, self.pending_events = self.pending_events, []
+        lines, self.pending_lines = self.pending_lines, []
+        return events, lines
+
+    def fetch_stats(self, timeout=EXIT_TIMEOUT_S):
+        # (LatencyStats da última sessão, tempo de CPU do engine); eventos e log no caminho ficam para o poll()
+        self.send('stats')
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.connection.poll(COMMAND_INTERVAL):
+                reply = self.receive(self.connection.recv())
+                if reply is not None:
+                    return reply
+        raise TimeoutError("engine process did not answer")
+
+    def close(self):
+        self.send('exit')
+        self.process.join(EXIT_TIMEOUT_S)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+        self.shared.close()
@@ -0,0 +1,51 @@
+import collections
+
+# Eventos tipados publicados pelos engines e lidos pela interface em lote.
+# Só carregam números e referências: nada de texto formatado no loop quente.
+
+# pressed/changed são bitmasks; buttons e keys são as tuplas do decoder do jogador
+StateChanged = collections.namedtuple('StateChanged', 'player pressed changed buttons keys')
+# phase: 'player', 'idle', 'hold', 'release', 'verify', 'verified', 'skipped', 'done'
+CalibrationStep = collections.namedtuple('CalibrationStep', 'player button phase')
+# kind: 'missing_profiles', 'no_controllers', 'connection', 'output', 'device', 'engine' (processo do engine caiu)
+ErrorEvent = collections.namedtuple('ErrorEvent', 'source kind message')
+# device é o dicionário devolvido por detect_controllers()
+DeviceAdded = collections.namedtuple('DeviceAdded', 'device')
+DeviceRemoved = collections.namedtuple('DeviceRemoved', 'device')
+# Falha e volta de um controle durante a tradução (reconnect_ms = tempo até reabrir)
+PlayerDisconnected = collections.namedtuple('PlayerDisconnected', 'player message')
+PlayerReconnected = collections.namedtuple('PlayerReconnected', 'player reconnect_ms')
+# Camada de teclas ativa de um jogador mudou (layer é o nome, ver engines/layers.py)
+LayerChanged = collections.namedtuple('LayerChanged', 'player layer')
+Started = collections.namedtuple('Started', 'source')
+# Controles abertos e loop rodando; t_ns é o perf_counter_ns() do momento
+Ready = collections.namedtuple('Ready', 'source players t_ns')
+Stopped = collections.namedtuple('Stopped', 'source')
+
+EVENT_CAPACITY = 4096
+
+
+class EventBus:
+    def __init__(self, capacity=EVENT_CAPACITY):
+        # deque com maxlen: append/popleft são atômicos, sem lock;
+        # se a interface atrasar, os eventos mais antigos são descartados
+        self.queue = collections.deque(maxlen=capacity)
+        self.dropped = 0
+
+    def publish(self, event):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+
+    def drain(self, limit=EVENT_CAPACITY):
+        batch = []
+        popleft = self.queue.popleft
+        try:
+            while len(batch) < limit:
+                batch.append(popleft())
+        except IndexError:
+            pass
+        return batch
+
+
+bus = EventBus()
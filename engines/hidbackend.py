@@ -0,0 +1,17 @@
+# Ponto único de acesso ao HID: por padrão a biblioteca real (hidapi),
+# mas qualquer objeto com enumerate() e device() pode tomar o lugar dela
+# (ex.: engines/hidsim.py para testes e benchmarks sem controles físicos)
+_backend = None
+
+
+def get_hid():
+    global _backend
+    if _backend is None:
+        import hid
+        _backend = hid
+    return _backend
+
+
+def use_backend(backend):
+    global _backend
+    _backend = backend
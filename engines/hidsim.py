@@ -0,0 +1,255 @@
+import random
+import time
+from .decoder import axis_entry
+from .latency import LatencyHistogram
+
+# Controle simulado no formato do clone de SNES documentado em mappingAndTesting/mapping.py
+IDLE_REPORT = [1, 128, 128, 127, 127, 15, 0, 0]
+BUTTON_BITS = {
+    'A': (5, 0x20), 'B': (5, 0x40), 'X': (5, 0x10), 'Y': (5, 0x80),
+    'L': (6, 0x01), 'R': (6, 0x02), 'select': (6, 0x10), 'start': (6, 0x20),
+}
+AXIS_VALUES = {'up': (4, 0), 'down': (4, 255), 'left': (3, 0), 'right': (3, 255)}
+AXIS_INDEXES = sorted({index for index, _ in AXIS_VALUES.values()})
+BUTTONS = ['up', 'down', 'left', 'right', 'A', 'B', 'X', 'Y', 'L', 'R', 'select', 'start']
+
+SIM_VENDOR_ID = 0x0810
+SIM_PRODUCT_ID = 0x0001
+
+
+def build_report(pressed):
+    report = list(IDLE_REPORT)
+    for button in pressed:
+        if button in BUTTON_BITS:
+            index, bit = BUTTON_BITS[button]
+            report[index] |= bit
+        else:
+            index, value = AXIS_VALUES[button]
+            report[index] = value
+    return report
+
+
+def sim_profile(axes=True, jitter=0):
+    # O mesmo perfil que a calibração geraria para este controle.
+    # axes=False gera o formato antigo, com o D-pad como máscara de bits.
+    profile = {}
+    for button in BUTTONS:
+        index = BUTTON_BITS[button][0] if button in BUTTON_BITS else AXIS_VALUES[button][0]
+        pressed = build_report([button])[index]
+        if axes and button in AXIS_VALUES:
+            profile[button] = axis_entry(index, IDLE_REPORT[index], pressed, jitter)
+        else:
+            profile[button] = {'index': index, 'idle_value': IDLE_REPORT[index], 'mask': pressed ^ IDLE_REPORT[index]}
+    return profile
+
+
+def add_jitter(report, rng, jitter):
+    # Controle barato: os bytes de eixo tremem em volta do valor real
+    report = list(report)
+    for index in AXIS_INDEXES:
+        report[index] = min(max(report[index] + rng.randint(-jitter, jitter), 0), 255)
+    return report
+
+
+# Padrões de botões: recebem o passo atual (um passo dura 'hold' relatórios)
+# e o controle virtual, e devolvem os botões apertados naquele passo
+def pattern_idle(step, controller):
+    return ()
+
+def pattern_cycle(step, controller):
+    # Cada botão é apertado por um passo e solto no seguinte
+    if step % 2:
+        return ()
+    return (BUTTONS[(step // 2) % len(BUTTONS)],)
+
+def pattern_mash(step, controller):
+    # Combinações aleatórias, reprodutíveis por controle e por passo
+    rng = controller.rng
+    rng.seed(step * 1024 + controller.index)
+    pressed = [button for button in BUTTONS[4:] if rng.random() < 0.3]
+    if rng.random() < 0.3:
+        pressed.append(rng.choice(('up', 'down')))
+    if rng.random() < 0.3:
+        pressed.append(rng.choice(('left', 'right')))
+    return tuple(pressed)
+
+def pattern_hold(step, controller):
+    return ('right', 'B')
+
+PATTERNS = {
+    'idle': pattern_idle,
+    'cycle': pattern_cycle,
+    'mash': pattern_mash,
+    'hold': pattern_hold,
+}
+
+
+class VirtualController:
+    def __init__(self, index, rate_hz, pattern, hold, only_changes, buffer_reports, jitter=0, bounce=0):
+        self.index = index
+        self.period = 1.0 / rate_hz
+        self.pattern = PATTERNS[pattern] if isinstance(pattern, str) else pattern
+        self.hold = hold
+        self.only_changes = only_changes
+        self.buffer_reports = buffer_reports
+        self.jitter = jitter
+        # Contato ruim: nos primeiros 'bounce' relatórios de cada passo o estado pisca entre o velho e o novo
+        self.bounce = bounce
+        self.previous_step_report = None
+        self.rng = random.Random()
+        self.jitter_rng = random.Random(index)
+        self.started = None
+        self.seq = 0
+        self.next_due = 0.0
+        self.last_report = None
+        self.step = None
+        self.step_report = None
+        self.reports = 0
+        self.overflowed = 0
+        # Cabo simulado: desconectar invalida os handles abertos até reabrir
+        self.plugged = True
+        self.generation = 0
+        # Quanto tempo cada relatório esperou no "buffer USB" até ser lido
+        self.age = LatencyHistogram()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.seq = 0
+        self.next_due = self.started
+        self.last_report = None
+
+    def report_for(self, seq):
+        step = seq // self.hold
+        if step != self.step:
+            self.step = step
+            self.previous_step_report = self.step_report
+            self.step_report = build_report(self.pattern(step, self))
+        offset = seq - step * self.hold
+        if offset < self.bounce and offset % 2 and self.previous_step_report is not None:
+            return self.previous_step_report
+        return self.step_report
+
+    def next_report(self, now):
+        # Relatórios que passariam do buffer do sistema são perdidos, como num HID real
+        backlog = int((now - self.next_due) / self.period) - self.buffer_reports
+        if backlog > 0:
+            self.seq += backlog
+            self.next_due += backlog * self.period
+            self.overflowed += backlog
+
+        while self.next_due <= now:
+            report = self.report_for(self.seq)
+            if self.jitter:
+                report = add_jitter(report, self.jitter_rng, self.jitter)
+            due = self.next_due
+            self.seq += 1
+            self.next_due += self.period
+            if self.only_changes and report == self.last_report:
+                continue
+            self.last_report = report
+            self.reports += 1
+            self.age.record(int((now - due) * 1e9))
+            return report
+        return None
+
+
+class SimulatedDevice:
+    def __init__(self, sim):
+        self.sim = sim
+        self.controller = None
+        self.generation = None
+        self.nonblocking = False
+
+    def attach(self, controller):
+        if not controller.plugged:
+            raise IOError('open failed: device unplugged')
+        self.controller = controller
+        self.generation = controller.generation
+
+    def open_path(self, path):
+        self.attach(self.sim.find(path))
+
+    def open(self, vendor_id, product_id, serial_number=None):
+        self.attach(self.sim.controllers[0])
+
+    def set_nonblocking(self, enabled):
+        self.nonblocking = bool(enabled)
+        return 0
+
+    def read(self, max_length, timeout_ms=0):
+        controller = self.controller
+        if controller is None:
+            raise IOError('read error: device not open')
+        if not controller.plugged or controller.generation != self.generation:
+            raise IOError('read error: device disconnected')
+        if controller.started is None:
+            controller.start()
+
+        if timeout_ms > 0:
+            deadline = time.perf_counter() + timeout_ms / 1000
+        elif self.nonblocking:
+            deadline = 0.0
+        else:
+            deadline = float('inf')
+
+        while True:
+            now = time.perf_counter()
+            report = controller.next_report(now)
+            if report is not None:
+                return report[:max_length]
+            if now >= deadline:
+                return []
+            time.sleep(max(min(controller.next_due, deadline) - now, 0))
+
+    def close(self):
+        self.controller = None
+
+
+class SimulatedHID:
+    def __init__(self, controllers=1, rate_hz=125, pattern='cycle', hold=8, only_changes=False,
+                 buffer_reports=32, vendor_id=SIM_VENDOR_ID, product_id=SIM_PRODUCT_ID, jitter=0, bounce=0):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.controllers = [
+            VirtualController(index, rate_hz, pattern, hold, only_changes, buffer_reports, jitter, bounce)
+            for index in range(controllers)
+        ]
+
+    def path(self, index):
+        return f'sim:{index}'.encode()
+
+    def find(self, path):
+        for controller in self.controllers:
+            if self.path(controller.index) == path:
+                return controller
+        raise IOError(f'open failed: {path!r}')
+
+    def unplug(self, index):
+        controller = self.controllers[index]
+        controller.plugged = False
+        controller.generation += 1
+
+    def plug(self, index):
+        self.controllers[index].plugged = True
+
+    def enumerate(self, vendor_id=0, product_id=0):
+        devices = []
+        for controller in self.controllers:
+            if not controller.plugged:
+                continue
+            devices.append({
+                'path': self.path(controller.index),
+                'vendor_id': self.vendor_id,
+                'product_id': self.product_id,
+                'serial_number': f'SIM{controller.index:04d}',
+                'release_number': 0x0100,
+                'manufacturer_string': 'Simulated',
+                'product_string': 'Simulated USB Gamepad',
+                'usage_page': 0x01,
+                'usage': 0x05,
+                'interface_number': 0,
+            })
+        return devices
+
+    def device(self):
+        return SimulatedDevice(self)
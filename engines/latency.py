@@ -0,0 +1,149 @@
+import csv
+import json
+import time
+
+# Histograma log-linear: 16 sub-faixas por potência de 2 (erro máximo ~6%),
+# tamanho fixo, sem alocação depois de criado
+SUB_BITS = 4
+MAX_SHIFT = 36
+BUCKETS = ((MAX_SHIFT + 1) << SUB_BITS) + (1 << SUB_BITS)
+
+STAGES = ('decode', 'emit', 'total')
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(value):
+    bits = value.bit_length()
+    if bits <= SUB_BITS + 1:
+        return value
+    shift = min(bits - SUB_BITS - 1, MAX_SHIFT)
+    return (shift << SUB_BITS) + min(value >> shift, (2 << SUB_BITS) - 1)
+
+
+def bucket_upper(index):
+    if index < 2 << SUB_BITS:
+        return index
+    shift = (index >> SUB_BITS) - 1
+    base = index - (shift << SUB_BITS)
+    return ((base + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        self.counts[bucket_index(ns)] += 1
+        self.count += 1
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+
+class PlayerStats:
+    def __init__(self):
+        self.reports = 0
+        self.events = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.last_reconnect_ms = None
+        # Mudanças engolidas pelo debounce (engines/debounce.py)
+        self.suppressed = 0
+        self.decode = LatencyHistogram()
+        self.emit = LatencyHistogram()
+        self.total = LatencyHistogram()
+
+
+class LatencyStats:
+    def __init__(self, players):
+        self.started = time.perf_counter()
+        self.players = [PlayerStats() for _ in range(players)]
+        # Atraso dos timers de turbo/macro (engines/scheduler.py), se houver
+        self.timers = None
+
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        result = {'elapsed_s': round(elapsed, 3), 'players': []}
+        for player_id, player in enumerate(self.players):
+            entry = {
+                'player': player_id + 1,
+                'reports': player.reports,
+                'events': player.events,
+                'reports_per_s': round(player.reports / elapsed, 1),
+                'events_per_s': round(player.events / elapsed, 1),
+                'disconnects': player.disconnects,
+                'reconnects': player.reconnects,
+                'last_reconnect_ms': None if player.last_reconnect_ms is None else round(player.last_reconnect_ms, 1),
+                'suppressed': player.suppressed,
+            }
+            for stage in STAGES:
+                histogram = getattr(player, stage)
+                entry[stage] = {f'p{p}_us': round(histogram.percentile(p) / 1000, 1) for p in PERCENTILES}
+                entry[stage]['max_us'] = round(histogram.max / 1000, 1)
+                entry[stage]['count'] = histogram.count
+            result['players'].append(entry)
+        if self.timers is not None and self.timers.count:
+            result['timer_late'] = {f'p{p}_us': round(self.timers.percentile(p) / 1000, 1) for p in PERCENTILES}
+            result['timer_late']['max_us'] = round(self.timers.max / 1000, 1)
+            result['timer_late']['count'] = self.timers.count
+        return result
+
+    def summary_lines(self, players=None):
+        lines = []
+        snapshot = self.snapshot()
+        for entry in snapshot['players'][:players]:
+            total = entry['total']
+            lines.append(
+                f"P{entry['player']} latency p50 {total['p50_us']}us p95 {total['p95_us']}us "
+                f"p99 {total['p99_us']}us max {total['max_us']}us | "
+                f"{entry['reports_per_s']} reports/s {entry['events_per_s']} events/s"
+            )
+            if entry['disconnects']:
+                lines.append(
+                    f"P{entry['player']} {entry['disconnects']} disconnects, {entry['reconnects']} reconnects, "
+                    f"last reconnect {entry['last_reconnect_ms']} ms"
+                )
+        if 'timer_late' in snapshot:
+            late = snapshot['timer_late']
+            lines.append(f"Turbo/macro timers: {late['count']} fired, late p50 {late['p50_us']}us "
+                         f"p99 {late['p99_us']}us max {late['max_us']}us")
+        return lines
+
+    def export(self, path):
+        snapshot = self.snapshot()
+        if str(path).endswith('.csv'):
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['player', 'stage', 'count', 'p50_us', 'p95_us', 'p99_us', 'max_us',
+                                 'reports', 'events', 'reports_per_s', 'events_per_s'])
+                for entry in snapshot['players']:
+                    for stage in STAGES:
+                        values = entry[stage]
+                        writer.writerow([entry['player'], stage, values['count'],
+                                         values['p50_us'], values['p95_us'], values['p99_us'], values['max_us'],
+                                         entry['reports'], entry['events'],
+                                         entry['reports_per_s'], entry['events_per_s']])
+        else:
+            with open(path, 'w') as file:
+                json.dump(snapshot, file, indent=4)
@@ -0,0 +1,94 @@
+import itertools
+
+# Camadas de teclas e atalhos de combinação, por jogador (settings.json):
+#   "keys":   {"A": "v", "B": "c", "select": "4"}           camada base
+#   "layers": {"menu": {"A": "enter", "B": "escape"}}        camadas por cima da base (só o que muda)
+#   "hold":   {"select": "menu"}                             enquanto segura select, vale a camada menu
+#                                                            (o botão de segurar não vira tecla)
+#   "chords": {"L+R+start": "next", "L+R+select": "menu"}    combinação apertada troca a camada fixa:
+#                                                            "next" (próxima), "base", ou o nome de uma
+#                                                            camada (apertar de novo volta para a base)
+# Os botões de uma combinação que disparou não viram tecla até serem soltos.
+BASE_LAYER = 'base'
+NEXT_LAYER = 'next'
+MAX_HOLD_BUTTONS = 8
+
+
+class LayerTable:
+    def __init__(self, names, maps, holds, hold_mask, chords, chord_mask):
+        self.names = names
+        # Mapa de teclas completo de cada camada (base + o que a camada troca)
+        self.maps = maps
+        # bits dos botões de segurar apertados -> camada; bits da combinação -> alvo
+        self.holds = holds
+        self.hold_mask = hold_mask
+        self.chords = chords
+        self.chord_mask = chord_mask
+        self.control_mask = hold_mask | chord_mask
+
+    def latch(self, target, latched):
+        # Camada fixa depois de uma combinação
+        if target == NEXT_LAYER:
+            return (latched + 1) % len(self.names)
+        if target == latched:
+            return 0
+        return target
+
+
+def button_mask(bits, names, where):
+    mask = 0
+    for name in names:
+        if name not in bits:
+            print(f"Warning: unknown button '{name}' in {where}, ignored")
+            return None
+        mask |= 1 << bits[name]
+    return mask
+
+
+def compile_layers(buttons, key_map, config):
+    # Devolve None quando o jogador não usa camadas nem combinações: o emissor nem olha
+    layers = config.get('layers') or {}
+    hold = config.get('hold') or {}
+    chords = config.get('chords') or {}
+    if not layers and not hold and not chords:
+        return None
+
+    names = [BASE_LAYER] + [name for name in layers if name != BASE_LAYER]
+    index = {name: position for position, name in enumerate(names)}
+    maps = [dict(key_map)] + [dict(key_map, **layers[name]) for name in names[1:]]
+    bits = {button: bit for bit, button in enumerate(buttons)}
+
+    hold_bits = []
+    for button, layer in hold.items():
+        if layer not in index:
+            print(f"Warning: unknown layer '{layer}' for hold button '{button}', ignored")
+            continue
+        mask = button_mask(bits, (button,), 'hold')
+        if mask is not None:
+            hold_bits.append((mask, index[layer]))
+    hold_bits = hold_bits[:MAX_HOLD_BUTTONS]
+    # Toda combinação de botões de segurar já resolvida: vale o primeiro da lista
+    holds = {}
+    for count in range(len(hold_bits), 0, -1):
+        for combination in itertools.combinations(hold_bits, count):
+            holds[sum(mask for mask, _ in combination)] = combination[0][1]
+    hold_mask = sum(mask for mask, _ in hold_bits)
+
+    chord_table = {}
+    for chord, target in chords.items():
+        mask = button_mask(bits, chord.split('+'), f"chord '{chord}'")
+        if mask is None:
+            continue
+        if target == BASE_LAYER:
+            chord_table[mask] = 0
+        elif target == NEXT_LAYER:
+            chord_table[mask] = NEXT_LAYER
+        elif target in index:
+            chord_table[mask] = index[target]
+        else:
+            print(f"Warning: unknown layer '{target}' in chord '{chord}', ignored")
+    chord_mask = 0
+    for mask in chord_table:
+        chord_mask |= mask
+
+    return LayerTable(tuple(names), maps, holds, hold_mask, chord_table, chord_mask)
@@ -0,0 +1,126 @@
+import os
+import threading
+from .controllerGetter import detect_controllers
+from .events import DeviceAdded, DeviceRemoved, bus
+from .profiles import ProfileStore, load_profiles
+
+MONITOR_INTERVAL = 1.0
+WATCH_INTERVAL = 0.5
+
+
+class DeviceMonitor(threading.Thread):
+    # Enumera os controles fora da thread da interface e só publica o que mudou
+    def __init__(self, interval=MONITOR_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.devices = []
+        self.paused = False
+        self.stop_event = threading.Event()
+        self.known = {}
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if not self.paused:
+                self.poll()
+            self.stop_event.wait(self.interval)
+
+    def poll(self):
+        try:
+            found = detect_controllers()
+        except Exception as ex:
+            # Mantém a última lista conhecida; tenta de novo no próximo ciclo
+            print(f"Device scan failed: {ex}")
+            return
+
+        current = {device['path']: device for device in found}
+        for path, device in current.items():
+            if path not in self.known:
+                bus.publish(DeviceAdded(device))
+        for path, device in self.known.items():
+            if path not in current:
+                bus.publish(DeviceRemoved(device))
+        self.known = current
+        # Troca a lista inteira de uma vez: quem lê nunca vê uma lista pela metade
+        self.devices = found
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class ProfileCache:
+    # Relê o profiles.json só quando o mtime ou o tamanho do arquivo mudam
+    def __init__(self, path):
+        self.path = path
+        self.signature = None
+        self.profiles = ProfileStore(path)
+
+    def get(self):
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            self.signature = None
+            self.profiles = ProfileStore(self.path)
+            return self.profiles
+
+        signature = (info.st_mtime_ns, info.st_size)
+        if signature != self.signature:
+            self.signature = signature
+            try:
+                self.profiles = load_profiles(self.path)
+            except (ValueError, OSError):
+                self.profiles = ProfileStore(self.path)
+        return self.profiles
+
+    def calibrated(self, devices):
+        # Quantos dos controles conectados já têm perfil (próprio ou do mesmo modelo)
+        return sum(1 for decoder in self.get().match(devices) if decoder is not None)
+
+
+def path_signature(path):
+    try:
+        info = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+class ConfigWatcher(threading.Thread):
+    # Confere mtime/tamanho dos arquivos a cada intervalo e chama check(changed) nesta thread,
+    # nunca na de quem está traduzindo. check recebe o conjunto de arquivos que mudaram
+    # (vazio na maioria das vezes) e também serve para conferir configuração em memória.
+    def __init__(self, paths, check, interval=WATCH_INTERVAL):
+        super().__init__(daemon=True)
+        self.paths = [path for path in paths if path]
+        self.check = check
+        self.interval = interval
+        self.signatures = {path: path_signature(path) for path in self.paths}
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            forced = self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            changed = set(self.paths) if forced else set()
+            for path in self.paths:
+                signature = path_signature(path)
+                if signature != self.signatures[path]:
+                    self.signatures[path] = signature
+                    changed.add(path)
+            try:
+                self.check(changed)
+            except Exception as ex:
+                # Arquivo pela metade ou inválido: não derruba o watcher e relê no próximo ciclo
+                print(f"Config not reloaded: {ex}")
+                for path in changed:
+                    self.signatures[path] = None
+
+    def poke(self):
+        # Relê tudo agora, mesmo sem mudança de mtime
+        self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
@@ -0,0 +1,84 @@
+import time
+
+
+class PynputBackend:
+    name = 'pynput'
+
+    def __init__(self):
+        # Import tardio: só quem realmente injeta teclas precisa do pynput
+        from pynput.keyboard import Controller, Key
+        self.controller = Controller()
+        self.special_keys = Key
+
+    def resolve(self, key):
+        # 'v' é uma tecla de caractere, 'up'/'enter'/'space' são Key.<nome>
+        if isinstance(key, str) and len(key) > 1:
+            if key not in self.special_keys.__members__:
+                raise ValueError(f"unknown key '{key}'. Use one character or a pynput Key name "
+                                 "such as 'enter', 'space', 'up' or 'f1'")
+            return self.special_keys[key]
+        return key
+
+    def press(self, key):
+        self.controller.press(key)
+
+    def release(self, key):
+        self.controller.release(key)
+
+    def close(self):
+        pass
+
+
+class NullBackend:
+    name = 'null'
+
+    def __init__(self):
+        self.presses = 0
+        self.releases = 0
+
+    def resolve(self, key):
+        return key
+
+    def press(self, key):
+        self.presses += 1
+
+    def release(self, key):
+        self.releases += 1
+
+    def close(self):
+        pass
+
+
+class RecordingBackend:
+    name = 'recording'
+
+    def __init__(self):
+        # (timestamp em ns, 'press' ou 'release', tecla)
+        self.events = []
+
+    def resolve(self, key):
+        return key
+
+    def press(self, key):
+        self.events.append((time.perf_counter_ns(), 'press', key))
+
+    def release(self, key):
+        self.events.append((time.perf_counter_ns(), 'release', key))
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'pynput': PynputBackend,
+    'null': NullBackend,
+    'recording': RecordingBackend,
+}
+
+
+def create_backend(backend='pynput'):
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown output backend '{backend}'. Options: {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -0,0 +1,59 @@
+import queue
+
+# Limite de relatórios lidos de uma vez, para um controle não monopolizar o ciclo
+MAX_DRAIN = 64
+
+
+class CoalesceStats:
+    def __init__(self):
+        self.reports = 0
+        self.dropped = 0
+        self.merged = 0
+
+    def __str__(self):
+        return f"{self.reports} reports, {self.dropped} duplicates dropped, {self.merged} merged"
+
+
+def drain_reports(gamepad, limit=MAX_DRAIN, size=64):
+    reports = []
+    while len(reports) < limit:
+        data = gamepad.read(size)
+        if not data:
+            break
+        reports.append(data)
+    return reports
+
+
+def drain_queue(reports, first, limit=MAX_DRAIN * 4):
+    batch = [first]
+    try:
+        while len(batch) < limit:
+            batch.append(reports.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def coalesce(previous, states, stats):
+    # Junta estados seguidos enquanto nenhum botão muda duas vezes no grupo:
+    # assim um toque rápido (aperta e solta) nunca some, só os passos redundantes
+    stats.reports += len(states)
+    kept = []
+    pending = previous
+    toggled = 0
+    for state in states:
+        change = state ^ pending
+        if not change:
+            stats.dropped += 1
+            continue
+        if change & toggled:
+            kept.append(pending)
+            toggled = change
+        else:
+            if toggled:
+                stats.merged += 1
+            toggled |= change
+        pending = state
+    if toggled:
+        kept.append(pending)
+    return kept
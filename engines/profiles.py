@@ -0,0 +1,175 @@
+import os
+import json
+import shutil
+from .decoder import compile_profile
+
+# profiles.json (versão 2): um perfil por controle, identificado pelo USB
+# {
+#     "version": 2,
+#     "profiles": [
+#         {"vendor_id": 2064, "product_id": 1, "serial_number": "", "interface_number": 0,
+#          "name": "USB Gamepad", "buttons": {"up": {"index": 4, "mask": 255, "idle_value": 127}}}
+#     ],
+#     "unassigned": []
+# }
+# A versão 1 era só uma lista de "buttons" na ordem do hid.enumerate(); ela é
+# migrada na primeira vez que os controles são vistos (ver bind_legacy).
+# "unassigned" guarda perfis da versão 1 que ainda não acharam um controle.
+PROFILE_VERSION = 2
+
+IDENTITY_FIELDS = ('vendor_id', 'product_id', 'serial_number', 'interface_number')
+
+
+def identity_key(device):
+    return (device.get('vendor_id') or 0, device.get('product_id') or 0,
+            device.get('serial_number') or '', device.get('interface_number', -1))
+
+
+def model_key(device):
+    # Mesmo modelo, qualquer número de série: controles iguais dividem a calibração
+    vendor_id, product_id, _, interface_number = identity_key(device)
+    return vendor_id, product_id, interface_number
+
+
+class ProfileStore:
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+        self.decoders = []
+        self.legacy = []
+        self.legacy_decoders = []
+        self.by_identity = {}
+        self.by_model = {}
+
+    def load_data(self, data):
+        if isinstance(data, list):
+            self.entries = []
+            self.legacy = data
+        else:
+            if data.get('version') != PROFILE_VERSION:
+                raise ValueError(f"Unsupported profiles version {data.get('version')}")
+            self.entries = data.get('profiles', [])
+            self.legacy = data.get('unassigned', [])
+        self.decoders = [compile_profile(entry['buttons']) for entry in self.entries]
+        self.legacy_decoders = [compile_profile(profile) if profile else None for profile in self.legacy]
+        self.index()
+
+    def index(self):
+        self.by_identity = {}
+        self.by_model = {}
+        for position, entry in enumerate(self.entries):
+            self.by_identity[identity_key(entry)] = position
+            self.by_model.setdefault(model_key(entry), position)
+
+    def __len__(self):
+        return len(self.entries) + sum(1 for profile in self.legacy if profile)
+
+    def lookup(self, device):
+        # O próprio controle primeiro; senão qualquer um do mesmo modelo
+        position = self.by_identity.get(identity_key(device))
+        if position is None:
+            position = self.by_model.get(model_key(device))
+        return position
+
+    def profile(self, device):
+        position = self.lookup(device)
+        return None if position is None else self.entries[position]['buttons']
+
+    def decoder(self, device):
+        position = self.lookup(device)
+        return None if position is None else self.decoders[position]
+
+    def match(self, devices):
+        # Um decoder (ou None) por controle, na ordem dada. Perfis da versão 1
+        # ainda não migrados valem pela posição, como antes.
+        decoders = []
+        for position, device in enumerate(devices):
+            decoder = self.decoder(device)
+            if decoder is None and position < len(self.legacy_decoders):
+                decoder = self.legacy_decoders[position]
+            decoders.append(decoder)
+        return decoders
+
+    def put(self, device, buttons):
+        entry = {field: device.get(field) for field in IDENTITY_FIELDS}
+        entry['name'] = device.get('name') or device.get('product_string')
+        entry['buttons'] = buttons
+        position = self.by_identity.get(identity_key(device))
+        if position is None:
+            self.entries.append(entry)
+            self.decoders.append(compile_profile(buttons))
+        else:
+            self.entries[position] = entry
+            self.decoders[position] = compile_profile(buttons)
+        self.index()
+
+    def put_unassigned(self, position, buttons):
+        # Perfil feito sem o controle conectado (calibração offline): fica em "unassigned"
+        # e vai para o controle desta posição na próxima vez que ele for visto
+        while len(self.legacy) <= position:
+            self.legacy.append(None)
+            self.legacy_decoders.append(None)
+        self.legacy[position] = buttons
+        self.legacy_decoders[position] = compile_profile(buttons)
+
+    def bind_legacy(self, devices):
+        # Dá a cada perfil da versão 1 o controle que está na mesma posição agora
+        bound = 0
+        for position, device in enumerate(devices):
+            if position >= len(self.legacy):
+                break
+            profile = self.legacy[position]
+            if profile and identity_key(device) not in self.by_identity:
+                self.put(device, profile)
+                # A vaga fica vazia: os perfis que sobram continuam na posição do controle deles
+                self.legacy[position] = None
+                self.legacy_decoders[position] = None
+                bound += 1
+        while self.legacy and not self.legacy[-1]:
+            self.legacy.pop()
+            self.legacy_decoders.pop()
+        return bound
+
+    def data(self):
+        return {'version': PROFILE_VERSION, 'profiles': self.entries, 'unassigned': self.legacy}
+
+    def save(self, path=None):
+        path = path or self.path
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.data(), file, indent=4)
+        # Troca atômica: quem estiver lendo nunca vê um arquivo pela metade
+        os.replace(temp_path, path)
+
+
+def load_profiles(path):
+    # Compila do JSON toda vez (menos de 1 ms por perfil). O cache compilado em disco do pedido
+    # original (pickle) foi retirado: carregar pickle ao lado do profiles.json executaria código.
+    # Erros de leitura do JSON (arquivo corrompido) sobem para quem chamou.
+    store = ProfileStore(path)
+    if path is None or not os.path.exists(path):
+        return store
+    with open(path) as file:
+        store.load_data(json.load(file))
+    return store
+
+
+def profiles_from_list(profiles):
+    # Perfis passados direto (benchmarks, replay) valem pela posição, sem disco
+    store = ProfileStore()
+    store.load_data(list(profiles))
+    return store
+
+
+def migrate_legacy(store, devices):
+    # Liga os perfis da versão 1 aos controles conectados e regrava no formato novo
+    if not store.legacy or not devices or store.path is None:
+        return 0
+    bound = store.bind_legacy(devices)
+    if bound:
+        backup_path = f'{store.path}.v1.bak'
+        if not os.path.exists(backup_path):
+            shutil.copyfile(store.path, backup_path)
+        store.save()
+        print(f"Migrated {bound} profiles in {store.path} to per-device profiles (backup: {backup_path})")
+    return bound
@@ -0,0 +1,178 @@
+import os
+import json
+import math
+import time
+import threading
+from .hidbackend import get_hid
+from .pipeline import MAX_DRAIN
+from .profiles import identity_key, model_key
+
+# Características medidas de cada controle (cli.py measure-devices), em devices.json ao lado
+# do profiles.json. A chave é a identidade USB; controles do mesmo modelo usam a medição
+# um do outro (ver characteristics_for).
+# {
+#     "2064:1:SIM0000:0": {"name": "USB Gamepad", "model": "2064:1:0", "reports": 375, "rate_hz": 125.0,
+#                          "interval_ms": 8.0, "interval_p99_ms": 8.4, "jitter_ms": 0.2,
+#                          "report_length": 8, "idle_repeats": true, "measured_s": 3.0}
+# }
+DEVICES_FILE = 'devices.json'
+MEASURE_S = 3.0
+MEASURE_TIMEOUT_MS = 50
+# Controle que repete o repouso mais rápido que isto é lido em lotes no modo 'auto'
+# (um despertar a cada 1/AUTO_MAX_WAKEUPS_HZ s em vez de um por relatório)
+AUTO_MAX_WAKEUPS_HZ = 500
+# No modo 'polling' cada controle é lido POLLS_PER_REPORT vezes por intervalo de relatório,
+# dentro destes limites
+POLLS_PER_REPORT = 2
+MIN_POLL_INTERVAL = 0.0005
+MAX_POLL_INTERVAL = 0.008
+# Relatórios a mais no lote, além dos esperados num intervalo (rajadas do jitter)
+DRAIN_MARGIN = 2
+MIN_DRAIN = 4
+READ_SIZE = 64
+
+
+def devices_path_for(profiles_path):
+    return os.path.join(os.path.dirname(str(profiles_path)), DEVICES_FILE)
+
+
+def device_key(key):
+    return ':'.join(str(part) for part in key)
+
+
+def load_characteristics(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (json.JSONDecodeError, OSError) as ex:
+        print(f"Warning: could not read {path} ({ex}). Using default read settings.")
+        return {}
+
+
+def save_characteristics(path, data):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(data, file, indent=4)
+    os.replace(temp_path, path)
+
+
+def characteristics_for(data, device):
+    found = data.get(device_key(identity_key(device)))
+    if found is None:
+        model = device_key(model_key(device))
+        found = next((entry for key, entry in data.items() if entry.get('model') == model), None)
+    return found
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(times_ns, reports, duration_s):
+    # Intervalo típico (mediana), p99, jitter (p95 da distância até a mediana) e
+    # se o controle repete relatórios iguais (manda o repouso sem parar)
+    result = {
+        'reports': len(reports),
+        'rate_hz': round(len(reports) / duration_s, 1),
+        'interval_ms': None,
+        'interval_p99_ms': None,
+        'jitter_ms': None,
+        'report_length': max((len(report) for report in reports), default=0),
+        'idle_repeats': False,
+        'measured_s': duration_s,
+    }
+    if len(reports) < 3:
+        return result
+    intervals = [(after - before) / 1e6 for before, after in zip(times_ns, times_ns[1:])]
+    median = percentile(intervals, 0.5)
+    repeats = sum(1 for before, after in zip(reports, reports[1:]) if before == after)
+    result.update({
+        'interval_ms': round(median, 3),
+        'interval_p99_ms': round(percentile(intervals, 0.99), 3),
+        'jitter_ms': round(percentile([abs(interval - median) for interval in intervals], 0.95), 3),
+        'idle_repeats': repeats >= (len(reports) - 1) / 2,
+    })
+    return result
+
+
+def measure_device(controller, duration_s=MEASURE_S):
+    # Leitura bloqueante: o instante de cada relatório é o da chegada, sem atraso de polling
+    gamepad = get_hid().device()
+    times_ns = []
+    reports = []
+    try:
+        gamepad.open_path(controller['path'])
+        gamepad.set_nonblocking(False)
+        deadline = time.perf_counter() + duration_s
+        while time.perf_counter() < deadline:
+            data = gamepad.read(READ_SIZE, MEASURE_TIMEOUT_MS)
+            if data:
+                times_ns.append(time.perf_counter_ns())
+                reports.append(data)
+    finally:
+        gamepad.close()
+    result = summarize(times_ns, reports, duration_s)
+    result['name'] = controller['name']
+    result['model'] = device_key(model_key(controller))
+    return result
+
+
+def measure_devices(controllers, duration_s=MEASURE_S):
+    # Todos ao mesmo tempo, um por thread: {chave do controle: características}
+    results = {}
+    errors = {}
+
+    def measure(controller):
+        try:
+            results[device_key(identity_key(controller))] = measure_device(controller, duration_s)
+        except IOError as ex:
+            errors[controller['name']] = str(ex)
+
+    workers = [threading.Thread(target=measure, args=(controller,), daemon=True) for controller in controllers]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, errors
+
+
+def read_strategy(characteristics, mode, poll_interval):
+    # Como o tradutor lê este controle. Sem medição fica tudo como sempre foi:
+    # leitura bloqueante no 'threaded'/'auto', poll_interval no 'polling', relatórios de até 64 bytes.
+    strategy = {
+        'read': 'polling' if mode == 'polling' else 'blocking',
+        'poll_interval': poll_interval,
+        'drain': MAX_DRAIN,
+        'read_size': READ_SIZE,
+        'reason': 'not measured',
+    }
+    if not characteristics:
+        return strategy
+    if characteristics['report_length']:
+        strategy['read_size'] = characteristics['report_length']
+    interval_ms = characteristics['interval_ms']
+    if not characteristics['idle_repeats'] or not interval_ms:
+        # Só manda relatório quando algo muda: não há ritmo para acompanhar
+        strategy['reason'] = 'reports on change'
+        return strategy
+
+    interval = interval_ms / 1000
+    rate = f"{1 / interval:.0f} Hz"
+    if mode == 'polling':
+        # Lê no ritmo do controle: nem 5 ms para um de 1000 Hz, nem 0,5 ms para um de 125 Hz
+        strategy['poll_interval'] = min(max(interval / POLLS_PER_REPORT, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+        strategy['reason'] = f"{rate}, polled every {strategy['poll_interval'] * 1000:.1f} ms"
+    elif mode == 'auto' and 1 / interval > AUTO_MAX_WAKEUPS_HZ:
+        strategy['read'] = 'polling'
+        strategy['poll_interval'] = 1 / AUTO_MAX_WAKEUPS_HZ
+        strategy['reason'] = f"{rate} idle repeats, drained every {strategy['poll_interval'] * 1000:.1f} ms"
+    else:
+        strategy['reason'] = rate
+    if strategy['read'] == 'polling':
+        # Quantos relatórios chegam num intervalo, contando a rajada do jitter
+        worst = strategy['poll_interval'] + (characteristics['jitter_ms'] or 0) / 1000
+        strategy['drain'] = min(max(math.ceil(worst / interval) + DRAIN_MARGIN, MIN_DRAIN), MAX_DRAIN)
+    return strategy
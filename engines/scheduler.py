@@ -0,0 +1,42 @@
+import heapq
+import itertools
+import time
+from .latency import LatencyHistogram
+
+
+class Scheduler:
+    # Heap de timers (instante em ns, ordem, callback) rodado pela thread do emissor:
+    # nenhuma thread dormindo por turbo ou macro. Sem timers, não custa nada.
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()
+        # Atraso de cada disparo em relação ao instante pedido (jitter)
+        self.late = LatencyHistogram()
+
+    def schedule(self, t_ns, callback):
+        timer = [t_ns, next(self.order), callback]
+        heapq.heappush(self.heap, timer)
+        return timer
+
+    def cancel(self, timer):
+        # Sai do heap só quando chegar no topo
+        if timer is not None:
+            timer[2] = None
+
+    def next_deadline(self):
+        heap = self.heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def run_due(self, now):
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            t_ns, _, callback = heapq.heappop(heap)
+            if callback is None:
+                continue
+            self.late.record(time.perf_counter_ns() - t_ns)
+            callback(t_ns)
+
+    def clear(self):
+        self.heap = []
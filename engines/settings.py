@@ -0,0 +1,108 @@
+import os
+import json
+from .debounce import check_debounce
+
+# settings.json fica ao lado do profiles.json. Exemplo:
+# {
+#     "max_players": 8,
+#     "players": [
+#         {"keys": {"up": "up", "down": "down", "A": "v", "start": "enter"}},
+#         {"keys": {"up": "w", "down": "s", "A": "l", "start": "space"}}
+#     ]
+# }
+# Jogadores sem "keys" usam o mapa padrão (PLAYER_KEY_MAPS em engines/translator.py).
+# "debounce" liga o filtro de repique (ver engines/debounce.py) para todos os jogadores;
+# players[i]["debounce"] troca qualquer campo só para aquele jogador:
+#     "debounce": {"mode": "time", "ms": 5, "budget_ms": 10, "buttons": {"A": {"ms": 8}}}
+# players[i] também aceita "layers", "hold" e "chords" (camadas de teclas, ver engines/layers.py).
+SETTINGS_FILE = 'settings.json'
+DEFAULT_MAX_PLAYERS = 8
+
+
+def settings_path_for(profiles_path):
+    return os.path.join(os.path.dirname(str(profiles_path)), SETTINGS_FILE)
+
+
+def check_key_map(key_map, where):
+    # Botão -> tecla ("v", "enter"), ação (turbo/macro, conferida em engines/actions.py) ou null.
+    # Se o nome da tecla existe só o backend de saída sabe (ver resolve em engines/outputs.py).
+    if not isinstance(key_map, dict):
+        raise ValueError(f"{where} must map button names to keys, got {key_map!r}")
+    for button, key in key_map.items():
+        if key is not None and not isinstance(key, dict) and (not isinstance(key, str) or not key):
+            raise ValueError(f"{where}: button '{button}' needs a key name like \"v\" or \"enter\", got {key!r}")
+
+
+def check_names(table, where):
+    if not isinstance(table, dict) or not all(isinstance(value, str) for value in table.values()):
+        raise ValueError(f"{where} must map buttons to layer names, got {table!r}")
+
+
+def check_settings(settings):
+    # ValueError com o lugar do erro; o tradutor mostra e não começa (ver start_translator)
+    max_players = settings['max_players']
+    if not isinstance(max_players, int) or isinstance(max_players, bool) or max_players < 1:
+        raise ValueError(f"max_players must be a whole number of 1 or more, got {max_players!r}")
+    if not isinstance(settings['players'], list):
+        raise ValueError(f"players must be a list with one object per player, got {settings['players']!r}")
+    check_debounce(settings['debounce'], "debounce")
+    for player_id, player in enumerate(settings['players']):
+        where = f"player {player_id + 1}"
+        if not isinstance(player, dict):
+            raise ValueError(f"{where} must be an object like {{\"keys\": {{...}}}}, got {player!r}")
+        if 'keys' in player:
+            check_key_map(player['keys'], f"{where} keys")
+        layers = player.get('layers') or {}
+        if not isinstance(layers, dict):
+            raise ValueError(f"{where} layers must map layer names to keys, got {layers!r}")
+        for name, layer in layers.items():
+            check_key_map(layer, f"{where} layer '{name}'")
+        check_names(player.get('hold') or {}, f"{where} hold")
+        check_names(player.get('chords') or {}, f"{where} chords")
+        if 'debounce' in player:
+            check_debounce(player['debounce'], f"{where} debounce")
+
+
+def load_settings(path, strict=False):
+    # strict: erros de leitura sobem para quem chamou (hot-reload mantém o que já tinha).
+    # Um arquivo que abre mas tem valores errados sobe sempre, como ValueError.
+    settings = {'max_players': DEFAULT_MAX_PLAYERS, 'players': [], 'debounce': {}}
+    if path and os.path.exists(path):
+        try:
+            with open(path) as file:
+                loaded = json.load(file)
+        except (json.JSONDecodeError, OSError) as ex:
+            if strict:
+                raise
+            print(f"Warning: could not read {path} ({ex}). Using default settings.")
+            return settings
+        if not isinstance(loaded, dict):
+            raise ValueError(f"{path} must hold a JSON object like {{\"players\": [...]}}, "
+                             f"got {type(loaded).__name__}")
+        settings.update(loaded)
+        check_settings(settings)
+    return settings
+
+
+def player_key_maps(settings, defaults):
+    key_maps = [dict(key_map) for key_map in defaults]
+    for player_id, player in enumerate(settings['players']):
+        if 'keys' not in player:
+            continue
+        while len(key_maps) <= player_id:
+            key_maps.append({})
+        key_maps[player_id] = dict(player['keys'])
+    return key_maps
+
+
+def player_layers(settings, player_id):
+    # Camadas, botões de segurar e combinações do jogador (ver engines/layers.py)
+    player = settings['players'][player_id] if player_id < len(settings['players']) else {}
+    return {key: player.get(key) or {} for key in ('layers', 'hold', 'chords')}
+
+
+def player_debounce(settings, player_id):
+    config = dict(settings['debounce'])
+    if player_id < len(settings['players']):
+        config.update(settings['players'][player_id].get('debounce', {}))
+    return config
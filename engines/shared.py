@@ -0,0 +1,123 @@
+import struct
+from multiprocessing import shared_memory
+
+# Bloco de memória compartilhada com o estado ao vivo de cada jogador, escrito pelo
+# processo do engine e lido pela interface sem lock, sem pickle e sem cópia do bloco.
+#
+# Cabeçalho: magic, versão, vagas, jogadores ativos, sessão (sobe a cada Start)
+# Por jogador, duas vagas com seqlock (cada uma tem um único escritor):
+#   estado   (thread do emissor): pressed, reports, events, suppressed, disconnects, reconnects
+#            (pressed guarda só os 64 primeiros botões; o tradutor não tem limite)
+#   latência (thread principal do engine, 1x/s): total p50/p99 em us, reports/s, events/s
+# O escritor deixa a sequência ímpar enquanto escreve; o leitor repete a leitura se
+# a sequência era ímpar ou mudou no meio.
+MAGIC = 0x55475044  # 'UGPD'
+SHARED_VERSION = 1
+MAX_SLOTS = 32
+READ_RETRIES = 64
+
+HEADER = struct.Struct('<IIIII')
+SEQUENCE = struct.Struct('<I4x')
+STATE = struct.Struct('<QQQQQQ')
+LATENCY = struct.Struct('<dddd')
+STATE_SLOT = SEQUENCE.size + STATE.size
+LATENCY_SLOT = SEQUENCE.size + LATENCY.size
+PLAYER_SLOT = STATE_SLOT + LATENCY_SLOT
+PRESSED_MASK = (1 << 64) - 1
+SEQUENCE_MASK = 0xFFFFFFFF
+
+
+class SharedState:
+    def __init__(self, memory, owner):
+        self.memory = memory
+        self.buffer = memory.buf
+        self.owner = owner
+        magic, version, self.slots, _, _ = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != SHARED_VERSION:
+            raise ValueError(f"{memory.name} is not a controller state block")
+        # Sequência atual de cada vaga; só o escritor daquela vaga usa
+        self.sequences = [0] * (self.slots * 2)
+
+    @classmethod
+    def create(cls, slots=MAX_SLOTS):
+        memory = shared_memory.SharedMemory(create=True, size=HEADER.size + slots * PLAYER_SLOT)
+        HEADER.pack_into(memory.buf, 0, MAGIC, SHARED_VERSION, slots, 0, 0)
+        return cls(memory, True)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Antes do Python 3.13 não há track=False; o processo do engine divide o
+            # resource_tracker com quem o criou, então registrar de novo não muda nada
+            memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, False)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def offset(self, player_id):
+        return HEADER.size + player_id * PLAYER_SLOT
+
+    def begin_session(self, players):
+        _, _, _, _, session = HEADER.unpack_from(self.buffer, 0)
+        for player_id in range(self.slots):
+            self.write_state(player_id, 0, 0, 0, 0, 0, 0)
+        HEADER.pack_into(self.buffer, 0, MAGIC, SHARED_VERSION, self.slots, min(players, self.slots), session + 1)
+
+    def header(self):
+        # (jogadores ativos, sessão)
+        return HEADER.unpack_from(self.buffer, 0)[3:]
+
+    def write(self, offset, index, layout, values):
+        # A sequência dá a volta em 32 bits (2^32 é par: ímpar continua sendo "escrevendo")
+        sequence = (self.sequences[index] + 1) & SEQUENCE_MASK
+        SEQUENCE.pack_into(self.buffer, offset, sequence)
+        layout.pack_into(self.buffer, offset + SEQUENCE.size, *values)
+        self.sequences[index] = (sequence + 1) & SEQUENCE_MASK
+        SEQUENCE.pack_into(self.buffer, offset, self.sequences[index])
+
+    def read(self, offset, layout):
+        buffer = self.buffer
+        for _ in range(READ_RETRIES):
+            before = SEQUENCE.unpack_from(buffer, offset)[0]
+            if before & 1:
+                continue
+            values = layout.unpack_from(buffer, offset + SEQUENCE.size)
+            if SEQUENCE.unpack_from(buffer, offset)[0] == before:
+                return values
+        # O escritor não parou de escrever: melhor pular um frame do que ler pela metade
+        return None
+
+    def write_state(self, player_id, pressed, reports, events, suppressed, disconnects, reconnects):
+        if player_id < self.slots:
+            # Perfil com mais de 64 botões: a interface só vê os 64 primeiros, o tradutor segue inteiro
+            self.write(self.offset(player_id), player_id * 2, STATE,
+                       (pressed & PRESSED_MASK, reports, events, suppressed, disconnects, reconnects))
+
+    def publish(self, player_id, pressed, player_stats):
+        # Chamado pelo tradutor a cada lote de relatórios de um jogador
+        self.write_state(player_id, pressed, player_stats.reports, player_stats.events,
+                         player_stats.suppressed, player_stats.disconnects, player_stats.reconnects)
+
+    def write_latency(self, player_id, p50_us, p99_us, reports_per_s, events_per_s):
+        if player_id < self.slots:
+            self.write(self.offset(player_id) + STATE_SLOT, player_id * 2 + 1, LATENCY,
+                       (p50_us, p99_us, reports_per_s, events_per_s))
+
+    def read_state(self, player_id):
+        # (pressed, reports, events, suppressed, disconnects, reconnects) ou None
+        return self.read(self.offset(player_id), STATE)
+
+    def read_latency(self, player_id):
+        # (p50_us, p99_us, reports_per_s, events_per_s) ou None
+        return self.read(self.offset(player_id) + STATE_SLOT, LATENCY)
+
+    def close(self):
+        # Solta a view antes de fechar, senão o mmap recusa
+        self.buffer.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,100 @@
+import time
+import threading
+from .controllerGetter import detect_controllers
+from .events import PlayerDisconnected, PlayerReconnected, bus
+from .hidbackend import get_hid
+from .profiles import identity_key, model_key
+
+# Intervalo entre tentativas de reencontrar um controle que caiu
+RECONNECT_INTERVAL = 0.5
+
+READ_ERRORS = (IOError, OSError, ValueError)
+
+
+class DeviceSupervisor:
+    # Cuida de um único controle: abre, lê, e se o cabo cair marca só este
+    # jogador como desconectado e tenta reabrir, sem derrubar os outros
+    def __init__(self, player_id, target, nonblocking, player_stats, strategy=None):
+        self.player_id = player_id
+        self.target = target
+        self.nonblocking = nonblocking
+        # Como ler este controle (ver engines/reportrate.read_strategy)
+        self.strategy = strategy
+        # Contadores de quedas e tempo de reconexão (engines/latency.PlayerStats)
+        self.stats = player_stats
+        self.gamepad = None
+        self.connected = False
+        self.failed_at = None
+        self.reconnect_thread = None
+
+    def open(self):
+        gamepad = get_hid().device()
+        gamepad.open_path(self.target['path'])
+        gamepad.set_nonblocking(self.nonblocking)
+        self.gamepad = gamepad
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+        if self.gamepad is not None:
+            try:
+                self.gamepad.close()
+            except READ_ERRORS:
+                pass
+            self.gamepad = None
+
+    def fail(self, ex):
+        self.close()
+        self.failed_at = time.perf_counter()
+        self.stats.disconnects += 1
+        print(f"Player {self.player_id + 1} disconnected: {ex}")
+        bus.publish(PlayerDisconnected(self.player_id, str(ex)))
+
+    def find_target(self, claimed_paths):
+        # Primeiro o mesmo caminho USB; senão o mesmo controle (identidade USB) ou
+        # um do mesmo modelo que nenhum outro jogador esteja usando (o cabo pode
+        # ter voltado em outra porta)
+        controllers = [c for c in detect_controllers() if c['path'] not in claimed_paths]
+        for controller in controllers:
+            if controller['path'] == self.target['path']:
+                return controller
+        for key in (identity_key, model_key):
+            for controller in controllers:
+                if key(controller) == key(self.target):
+                    return controller
+        return None
+
+    def try_reconnect(self, claimed_paths=()):
+        target = self.find_target(set(claimed_paths))
+        if target is None:
+            return False
+        previous_target = self.target
+        self.target = target
+        try:
+            self.open()
+        except READ_ERRORS:
+            self.target = previous_target
+            self.close()
+            return False
+
+        reconnect_ms = (time.perf_counter() - self.failed_at) * 1000 if self.failed_at else 0.0
+        self.stats.reconnects += 1
+        self.stats.last_reconnect_ms = reconnect_ms
+        print(f"Player {self.player_id + 1} reconnected in {reconnect_ms:.0f} ms: {target['name']}")
+        bus.publish(PlayerReconnected(self.player_id, reconnect_ms))
+        return True
+
+    def reconnect_loop(self, stop_event, claimed_paths):
+        while not stop_event.wait(RECONNECT_INTERVAL):
+            if self.try_reconnect(claimed_paths()):
+                return True
+        return False
+
+    def start_reconnect(self, stop_event, claimed_paths):
+        # Em segundo plano, para a enumeração não travar os outros jogadores
+        if self.reconnect_thread is not None and self.reconnect_thread.is_alive():
+            return
+        self.reconnect_thread = threading.Thread(
+            target=self.reconnect_loop, args=(stop_event, claimed_paths), daemon=True
+        )
+        self.reconnect_thread.start()
@@ -1,10 +1,24 @@
 import sys
-import hid
 import time
-import json
 import os
-from pynput.keyboard import Controller, Key
+import queue
+import threading
 from engines.controllerGetter import detect_controllers
+from engines.capture import MULTI_DEVICE_WIDTH, CaptureWriter
+from engines.actions import action_label, create_action, is_action
+from engines.debounce import create_debouncer
+from engines.decoder import iter_bits
+from engines.events import ErrorEvent, LayerChanged, Ready, Started, StateChanged, Stopped, bus
+from engines.layers import BASE_LAYER, compile_layers
+from engines.latency import LatencyStats
+from engines.monitor import ConfigWatcher
+from engines.outputs import create_backend
+from engines.pipeline import CoalesceStats, coalesce, drain_queue, drain_reports
+from engines.profiles import load_profiles, migrate_legacy, profiles_from_list
+from engines.reportrate import characteristics_for, devices_path_for, load_characteristics, read_strategy
+from engines.scheduler import Scheduler
+from engines.settings import load_settings, player_debounce, player_key_maps, player_layers, settings_path_for
+from engines.supervisor import READ_ERRORS, DeviceSupervisor
 
 def get_path_profile():
     if getattr(sys, 'frozen', False):
@@ -20,104 +34,746 @@ def get_path_profile():
 
 # Guardamos o caminho correto nesta variável para usar no resto do código
 PATH_JSON = get_path_profile()
+# Mapas de teclas por jogador e limite de jogadores (ver engines/settings.py)
+SETTINGS_PATH = settings_path_for(PATH_JSON)
+# Ritmo, jitter e tamanho de relatório medidos de cada controle (cli.py measure-devices)
+DEVICES_PATH = devices_path_for(PATH_JSON)
 
-keyboard_controller = Controller()
+# Saída das teclas: 'pynput' (teclado real), 'null' ou 'recording' (ver engines/outputs.py)
+OUTPUT_BACKEND = 'pynput'
 
+# Um caractere é a própria tecla; nomes maiores ('up', 'enter', 'space') são teclas especiais.
+# Estes são os padrões; o settings.json pode trocar o mapa de qualquer jogador ou criar mais.
 PLAYER_KEY_MAPS = [
     { # PLAYER 1
-        'up': Key.up, 'down': Key.down, 'left': Key.left, 'right': Key.right,
+        'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right',
         'A': 'v', 'B': 'c', 'X': 'f', 'Y': 'x',
         'L': '1', 'R': '2', 'start': '3', 'select': '4'
     },
     { # PLAYER 2
         'up': 'w', 'down': 's', 'left': 'a', 'right': 'd',
         'A': 'l', 'B': 'k', 'X': 'i', 'Y': 'j',
-        'L': 'q', 'R': 'e', 'start': Key.enter, 'select': Key.space
+        'L': 'q', 'R': 'e', 'start': 'enter', 'select': 'space'
+    },
+    { # PLAYER 3
+        'up': 't', 'down': 'g', 'left': 'r', 'right': 'y',
+        'A': 'n', 'B': 'b', 'X': 'h', 'Y': 'u',
+        'L': '5', 'R': '6', 'start': '7', 'select': '8'
+    },
+    { # PLAYER 4
+        'up': '[', 'down': "'", 'left': ';', 'right': '\\',
+        'A': '.', 'B': ',', 'X': 'p', 'Y': 'm',
+        'L': '9', 'R': '0', 'start': '-', 'select': '='
     }
 ]
 
+# 'threaded': uma thread de leitura bloqueante por controle, um único emissor
+# 'polling': o loop original, não-bloqueante, cada controle lido no próprio ritmo medido
+# 'auto': como 'threaded', mas controles que repetem o repouso muito rápido são lidos em
+#         lotes (ver engines/reportrate.read_strategy)
+READER_MODE = 'threaded'
+READER_MODES = ('threaded', 'polling', 'auto')
+READ_TIMEOUT_MS = 50
+POLL_INTERVAL = 0.005
+
+# Se definido, todos os relatórios crus da sessão são gravados aqui (.hidtrace, ver engines/capture.py)
+CAPTURE_PATH = None
+
+# Se definido, as estatísticas de latência são salvas aqui no Stop (.json ou .csv)
+STATS_EXPORT_PATH = None
+
 is_running = True
+stop_event = threading.Event()
+_wake_emitter = None
+# Marcador na fila: o controle deste jogador caiu
+DISCONNECTED = object()
+# O prazo do próximo timer chegou sem relatório novo
+TIMED_OUT = object()
+# Marcador na fila: só acorda o emissor (perfil novo esperando para entrar)
+WAKE = object()
+# O último trecho antes de um timer (turbo, macro) é esperado ativamente, cedendo a CPU:
+# o timeout do sistema sozinho acorda de 100us a alguns ms atrasado
+TIMER_SPIN_NS = 1_000_000
+# Estatísticas da sessão atual, lidas ao vivo pela interface e pelo socket de controle
+stats = None
+# Controles em uso e contadores de entrada da sessão atual (um por jogador)
+active_devices = []
+input_stats = []
+# Pede ao watcher da sessão atual para reler perfis e teclas já (ver reload_profiles)
+_reload_now = None
 
-def start_translator():
+def stop_translator():
     global is_running
+    is_running = False
+    stop_event.set()
+    # Acorda o emissor na hora, sem esperar o timeout dos leitores
+    if _wake_emitter is not None:
+        _wake_emitter(None)
+
+def reload_profiles():
+    # Relê profiles.json e settings.json sem parar a tradução; False se nada está rodando
+    if _reload_now is None:
+        return False
+    _reload_now()
+    return True
+
+def layer_setup(buttons, key_map, output, scheduler, player_stats):
+    # Tabela de uma camada indexada pelo bit do botão
+    specs = tuple(key_map.get(button) for button in buttons)
+    actions = {}
+    for bit, spec in enumerate(specs):
+        if not is_action(spec):
+            continue
+        try:
+            actions[bit] = create_action(spec, output, scheduler, player_stats)
+        except ValueError as ex:
+            raise ValueError(f"button '{buttons[bit]}': {ex}") from None
+    # As teclas são resolvidas uma vez para o formato nativo do backend
+    keys = []
+    for button, key in zip(buttons, specs):
+        try:
+            keys.append(output.resolve(key) if key and not is_action(key) else None)
+        except ValueError as ex:
+            raise ValueError(f"button '{button}': {ex}") from None
+    return {
+        'specs': specs,
+        'labels': tuple(action_label(spec) for spec in specs),
+        'keys': keys,
+        'actions': actions,
+        'action_mask': sum(1 << bit for bit in actions),
+    }
+
+def player_setup(decoder, key_map, layer_config, debounce_config, output, scheduler, player_stats):
+    # Tudo o que o emissor usa de um jogador, montado fora do loop quente (no Start ou no watcher)
+    table = compile_layers(decoder.buttons, key_map, layer_config)
+    maps = table.maps if table is not None else [key_map]
+    return {
+        'decoder': decoder,
+        'table': table,
+        'layers': [layer_setup(decoder.buttons, layer_map, output, scheduler, player_stats) for layer_map in maps],
+        'debouncer': create_debouncer(decoder.buttons, debounce_config),
+    }
+
+def run_polling(supervisors, process_reports, release_player, claimed_paths, next_deadline, run_timers):
+    # Cada controle tem o próprio intervalo de leitura (POLL_INTERVAL se não foi medido)
+    next_poll = [0] * len(supervisors)
+    while is_running and not stop_event.is_set():
+        for position, supervisor in enumerate(supervisors):
+            if not supervisor.connected:
+                continue
+            strategy = supervisor.strategy
+            now = time.perf_counter_ns()
+            if now < next_poll[position]:
+                continue
+            next_poll[position] = now + int(strategy['poll_interval'] * 1e9)
+            try:
+                # Esvazia tudo o que acumulou no buffer HID, não só um relatório
+                pending = drain_reports(supervisor.gamepad, strategy['drain'], strategy['read_size'])
+            except READ_ERRORS as ex:
+                # Só este jogador cai; os outros continuam jogando
+                supervisor.fail(ex)
+                release_player(supervisor.player_id)
+                supervisor.start_reconnect(stop_event, claimed_paths)
+                continue
+            if pending:
+                process_reports(pending, supervisor.player_id, time.perf_counter_ns())
+        # Depois de ler tudo: um repique ainda no buffer cancela a mudança antes dela vencer
+        if next_deadline() is not None:
+            run_timers(time.perf_counter_ns(), True)
+        # Dorme até o próximo controle a ler ou o próximo timer (turbo, macro, debounce)
+        polls = [next_poll[position] for position, supervisor in enumerate(supervisors) if supervisor.connected]
+        now = time.perf_counter_ns()
+        wake = min(polls) if polls else now + int(POLL_INTERVAL * 1e9)
+        deadline = next_deadline()
+        if deadline is not None and deadline <= wake:
+            # Timer primeiro: mesma espera do modo threaded, com o último trecho ativo
+            wait_until(deadline)
+        elif wake > now:
+            time.sleep((wake - now) / 1e9)
+
+def wait_until(deadline):
+    # Como wait_report, sem fila: dorme até TIMER_SPIN_NS antes do prazo e espera o resto cedendo a CPU
+    timeout = (deadline - TIMER_SPIN_NS - time.perf_counter_ns()) / 1e9
+    if timeout > 0:
+        time.sleep(timeout)
+    while time.perf_counter_ns() < deadline:
+        time.sleep(0)
+
+def read_reports(supervisor, reports, claimed_paths):
+    player_id = supervisor.player_id
+    strategy = supervisor.strategy
+    while not stop_event.is_set():
+        if not supervisor.connected:
+            if not supervisor.reconnect_loop(stop_event, claimed_paths):
+                break
+        try:
+            if strategy['read'] == 'polling':
+                # Controle que repete o repouso muito rápido: um despertar por lote, não por relatório
+                if stop_event.wait(strategy['poll_interval']):
+                    break
+                batch = drain_reports(supervisor.gamepad, strategy['drain'], strategy['read_size'])
+            else:
+                data = supervisor.gamepad.read(strategy['read_size'], READ_TIMEOUT_MS)
+                batch = (data,) if data else ()
+        except READ_ERRORS as ex:
+            supervisor.fail(ex)
+            reports.put((player_id, DISCONNECTED, 0))
+            continue
+        t_read = time.perf_counter_ns()
+        for data in batch:
+            reports.put((player_id, data, t_read))
+
+def wait_report(reports, deadline):
+    timeout = (deadline - TIMER_SPIN_NS - time.perf_counter_ns()) / 1e9
+    if timeout > 0:
+        try:
+            return reports.get(timeout=timeout)
+        except queue.Empty:
+            pass
+    while time.perf_counter_ns() < deadline:
+        try:
+            return reports.get_nowait()
+        except queue.Empty:
+            time.sleep(0)
+    return TIMED_OUT
+
+def run_threaded(supervisors, process_reports, release_player, claimed_paths, next_deadline, run_timers):
+    global _wake_emitter
+    reports = queue.SimpleQueue()
+    readers = [
+        threading.Thread(target=read_reports, args=(supervisor, reports, claimed_paths), daemon=True)
+        for supervisor in supervisors
+    ]
+    _wake_emitter = reports.put
+    try:
+        for reader in readers:
+            reader.start()
+
+        while is_running and not stop_event.is_set():
+            # Com timers pendentes (turbo, macro, debounce), acorda no vencimento mesmo sem relatório novo
+            deadline = next_deadline()
+            if deadline is None:
+                first = reports.get()
+            else:
+                first = wait_report(reports, deadline)
+                if first is TIMED_OUT:
+                    run_timers(time.perf_counter_ns(), True)
+                    continue
+                # Relatórios chegando sem parar não podem atrasar o turbo
+                run_timers(time.perf_counter_ns(), False)
+            batch = drain_queue(reports, first)
+            pending = {}
+            for item in batch:
+                if item is None:
+                    break
+                if item is WAKE:
+                    continue
+                player_id, data, t_read = item
+                if data is DISCONNECTED:
+                    # Relatórios já na fila deste jogador ainda valem; depois solta as teclas dele
+                    if player_id in pending:
+                        player_reports, first_read = pending.pop(player_id)
+                        process_reports(player_reports, player_id, first_read)
+                    release_player(player_id)
+                    continue
+                if player_id in pending:
+                    pending[player_id][0].append(data)
+                else:
+                    # Guarda o instante do relatório mais antigo do lote
+                    pending[player_id] = ([data], t_read)
+            for player_id, (player_reports, t_read) in pending.items():
+                process_reports(player_reports, player_id, t_read)
+    finally:
+        _wake_emitter = None
+        stop_event.set()
+        # Só fecha os controles depois que nenhuma thread está lendo
+        for reader in readers:
+            reader.join()
+
+def start_translator(mode=None, backend=None, stats_path=None, profiles=None, capture_path=None, players=None,
+                     debounce=None, shared=None):
+    global is_running, stats, active_devices, input_stats, _reload_now
     is_running = True
+    stop_event.clear()
+    mode = mode or READER_MODE
+    stats_path = stats_path or STATS_EXPORT_PATH
+    capture_path = capture_path or CAPTURE_PATH
     print("Starting Universal Multiplayer Translator...")
+    bus.publish(Started('translator'))
+    if mode not in READER_MODES:
+        print(f"Error: unknown reader mode '{mode}'. Options: {', '.join(READER_MODES)}")
+        bus.publish(ErrorEvent('translator', 'config', f"unknown reader mode '{mode}'"))
+        return
+    if players is not None and (not isinstance(players, int) or players < 1):
+        print(f"Error: players must be 1 or more, got {players!r}")
+        bus.publish(ErrorEvent('translator', 'config', f"players must be 1 or more, got {players!r}"))
+        return
+
+    if profiles is not None:
+        # Perfis passados direto (benchmarks, replay), sem tocar no disco
+        store = profiles_from_list(profiles)
+    else:
+        # CARREGA OS PERFIS FRESQUINHOS DO DISCO TODA VEZ QUE CLICA START!
+        if not os.path.exists(PATH_JSON):
+            print(f"Error: {PATH_JSON} not found!")
+            print("Please run 'Calibrate Controllers' first.")
+            bus.publish(ErrorEvent('translator', 'missing_profiles', f"{PATH_JSON} not found"))
+            return
+
+        try:
+            store = load_profiles(PATH_JSON)
+        except (ValueError, OSError) as ex:
+            print(f"Error: could not read {PATH_JSON} ({ex})")
+            bus.publish(ErrorEvent('translator', 'missing_profiles', str(ex)))
+            return
+
+    try:
+        settings = load_settings(SETTINGS_PATH)
+    except ValueError as ex:
+        print(f"Error: invalid settings in {SETTINGS_PATH} ({ex})")
+        bus.publish(ErrorEvent('translator', 'config', str(ex)))
+        return
+    key_maps = player_key_maps(settings, PLAYER_KEY_MAPS)
+    max_players = players or settings['max_players']
+    if debounce is not None:
+        # Debounce passado direto (benchmarks) vale para todos os jogadores
+        settings['debounce'] = debounce
 
-    # CARREGA OS PERFIS FRESQUINHOS DO DISCO TODA VEZ QUE CLICA START!
-    if not os.path.exists(PATH_JSON):
-        print(f"Error: {PATH_JSON} not found!")
-        print("Please run 'Calibrate Controllers' first.")
+    try:
+        connected_controllers = detect_controllers()
+    except IOError as ex:
+        print(f"Connection Error: {ex}")
+        bus.publish(ErrorEvent('translator', 'connection', str(ex)))
         return
 
-    with open(PATH_JSON, 'r') as file:
-        loaded_profiles = json.load(file)
+    if not connected_controllers:
+        print("No controllers found. Exiting.")
+        bus.publish(ErrorEvent('translator', 'no_controllers', "No controllers found"))
+        return
+
+    migrate_legacy(store, connected_controllers)
 
-    current_state = [{button: False for button in p.keys()} for p in loaded_profiles]
-    previous_state = [{button: False for button in p.keys()} for p in loaded_profiles]
+    # Cada controle acha o próprio perfil pela identidade USB, não pela ordem da enumeração
+    targets = []
+    decoders = []
+    for controller, decoder in zip(connected_controllers, store.match(connected_controllers)):
+        if decoder is None:
+            print(f"No profile for {controller['name']}. Run 'Calibrate Controllers' to add it.")
+            continue
+        if len(targets) < max_players:
+            targets.append(controller)
+            decoders.append(decoder)
+
+    if not targets:
+        print("None of the connected controllers is calibrated.")
+        bus.publish(ErrorEvent('translator', 'missing_profiles', "No calibrated controllers connected"))
+        return
+
+    try:
+        output = create_backend(backend or OUTPUT_BACKEND)
+    except (ImportError, ValueError) as ex:
+        print(f"Error: keyboard output unavailable ({ex})")
+        bus.publish(ErrorEvent('translator', 'output', str(ex)))
+        return
+
+    # Os decoders já vêm compilados do ProfileStore: cada relatório vira um bitmask de botões
+    previous_pressed = [0] * len(decoders)
+    # Último estado cru decodificado (antes do debounce), base da histerese dos eixos
+    last_decoded = [0] * len(decoders)
+    coalesce_stats = [CoalesceStats() for _ in decoders]
+    stats = LatencyStats(len(decoders))
+    # Turbo e macros: um único scheduler, rodado pela thread do emissor
+    scheduler = Scheduler()
+    stats.timers = scheduler.late
+
+    def key_map_for(player_id):
+        return key_maps[player_id] if player_id < len(key_maps) else {}
+
+    # Turbo, macro, camada ou debounce mal escritos no settings.json param aqui, antes de abrir os controles
+    setups = []
+    for player_id, decoder in enumerate(decoders):
+        try:
+            setups.append(player_setup(decoder, key_map_for(player_id), player_layers(settings, player_id),
+                                       player_debounce(settings, player_id), output, scheduler,
+                                       stats.players[player_id]))
+        except (ValueError, TypeError) as ex:
+            message = f"player {player_id + 1}: {ex}"
+            print(f"Error: invalid settings in {SETTINGS_PATH} ({message})")
+            bus.publish(ErrorEvent('translator', 'config', message))
+            output.close()
+            return
+
+    active_devices = targets
+    input_stats = coalesce_stats
+    # Processo separado (engines/engineprocess.py): estado ao vivo vai para a memória compartilhada
+    if shared is not None:
+        shared.begin_session(len(decoders))
+    capture = None
+    if capture_path:
+        capture = CaptureWriter(capture_path, MULTI_DEVICE_WIDTH if len(targets) > 1 else None)
+    # Listas por jogador lidas pelo emissor; só ele as troca (ver install_layer e apply_swaps)
+    key_specs = [setup['layers'][0]['specs'] for setup in setups]
+    key_labels = [setup['layers'][0]['labels'] for setup in setups]
+    player_keys = [setup['layers'][0]['keys'] for setup in setups]
+    player_actions = [setup['layers'][0]['actions'] for setup in setups]
+    action_masks = [setup['layers'][0]['action_mask'] for setup in setups]
+    debouncers = [setup['debouncer'] for setup in setups]
+    active_debouncers = [(player_id, d) for player_id, d in enumerate(debouncers) if d is not None]
+    # Camadas (engines/layers.py): só jogadores com control_mask diferente de 0 passam por layer_input
+    player_setups = setups
+    control_masks = [setup['table'].control_mask if setup['table'] else 0 for setup in setups]
+    active_layers = [0] * len(decoders)
+    latched_layers = [0] * len(decoders)
+    last_control = [0] * len(decoders)
+    suppressed_chords = [0] * len(decoders)
+    # Estado que chegou no apply_state, antes das camadas
+    player_input = [0] * len(decoders)
+    # Perfis recompilados pelo watcher, esperando o emissor entre dois lotes de relatórios
+    pending_swaps = {}
+
+    def install_layer(player_id, layer, new_bits=None):
+        # Troca a tabela de teclas do jogador (outra camada ou perfil novo); new_bits é
+        # nome -> bit do decoder novo, None se o decoder é o mesmo. Teclas seguradas que
+        # continuam iguais (turbo incluído) ficam apertadas; as outras são soltas e o
+        # próximo apply_state aperta as da tabela nova.
+        old_buttons = decoders[player_id].buttons
+        old_specs = key_specs[player_id]
+        old_keys = player_keys[player_id]
+        old_actions = player_actions[player_id]
+        # Cópia: a tabela da camada é compilada uma vez e vale para todas as próximas ativações
+        actions = dict(layer['actions'])
+        carried = 0
+        events = 0
+        for bit in iter_bits(previous_pressed[player_id]):
+            new_bit = bit if new_bits is None else new_bits.get(old_buttons[bit])
+            if new_bit is not None and layer['specs'][new_bit] == old_specs[bit]:
+                carried |= 1 << new_bit
+                if bit in old_actions:
+                    actions[new_bit] = old_actions[bit]
+            elif bit not in old_actions and old_keys[bit]:
+                output.release(old_keys[bit])
+                events += 1
+        kept = set(actions.values())
+        for action in old_actions.values():
+            if action not in kept:
+                events += action.cancel()
+
+        key_specs[player_id] = layer['specs']
+        key_labels[player_id] = layer['labels']
+        player_keys[player_id] = layer['keys']
+        player_actions[player_id] = actions
+        action_masks[player_id] = layer['action_mask']
+        previous_pressed[player_id] = carried
+        return events
+
+    def layer_input(pressed, player_id):
+        # Só faz algo quando um botão de segurar ou de combinação muda
+        table = player_setups[player_id]['table']
+        events = 0
+        control = pressed & table.control_mask
+        if control != last_control[player_id]:
+            chord = control & table.chord_mask
+            if chord != last_control[player_id] & table.chord_mask:
+                target = table.chords.get(chord)
+                if target is not None:
+                    latched_layers[player_id] = table.latch(target, latched_layers[player_id])
+                    suppressed_chords[player_id] |= chord
+            last_control[player_id] = control
+            layer = table.holds.get(control & table.hold_mask, latched_layers[player_id])
+            if layer != active_layers[player_id]:
+                active_layers[player_id] = layer
+                events = install_layer(player_id, player_setups[player_id]['layers'][layer])
+                bus.publish(LayerChanged(player_id, table.names[layer]))
+        # Botões de uma combinação que disparou ficam mudos até serem soltos
+        suppressed_chords[player_id] &= pressed
+        return pressed & ~(suppressed_chords[player_id] | table.hold_mask), events
 
     # Função interna para usar as variáveis frescas
-    def process_inputs(report, player_id):
-        profile = loaded_profiles[player_id]
-        state_atual = current_state[player_id]
-        state_anterior = previous_state[player_id]
-        key_map = PLAYER_KEY_MAPS[player_id]
-
-        for button_name, config in profile.items():
-            idx = config['index']
-            mask = config['mask']
-            idle_val = config['idle_value']
-            
-            if len(report) <= idx: continue
-                
-            is_pressed = ((report[idx] ^ idle_val) & mask) == mask
-            state_atual[button_name] = is_pressed
-
-        for button, is_pressed in state_atual.items():
-            virtual_key = key_map.get(button)
+    def apply_state(pressed, player_id):
+        player_input[player_id] = pressed
+        events = 0
+        if control_masks[player_id]:
+            pressed, events = layer_input(pressed, player_id)
+        decoder = decoders[player_id]
+        keys = player_keys[player_id]
+
+        changed = pressed ^ previous_pressed[player_id]
+        previous_pressed[player_id] = pressed
+
+        special = changed & action_masks[player_id]
+        if special:
+            actions = player_actions[player_id]
+            t_now = time.perf_counter_ns()
+            for bit in iter_bits(special & ~pressed):
+                events += actions[bit].release(t_now)
+            for bit in iter_bits(special & pressed):
+                events += actions[bit].press(t_now)
+
+        # Só as bordas viram eventos: segurar um botão não reenvia a tecla a cada relatório
+        # Solta antes de apertar: num passo juntado, a tecla velha não fica presa junto com a nova
+        for bit in iter_bits(changed & ~pressed):
+            virtual_key = keys[bit]
             if not virtual_key: continue
+            output.release(virtual_key)
+            events += 1
 
-            if is_pressed:
-                keyboard_controller.press(virtual_key)
-                if not state_anterior[button]:
-                    print(f"[P{player_id + 1}] {button} Pressed -> Key '{virtual_key}'")
-            elif not is_pressed and state_anterior[button]:
-                keyboard_controller.release(virtual_key)
-                print(f"[P{player_id + 1}] {button} Released")
-            
-            state_anterior[button] = is_pressed
+        for bit in iter_bits(changed & pressed):
+            virtual_key = keys[bit]
+            if not virtual_key: continue
+            output.press(virtual_key)
+            events += 1
 
-    open_gamepads = []
+        # Só números vão para a interface; o texto é montado lá, fora do loop quente
+        if changed:
+            bus.publish(StateChanged(player_id, pressed, changed, decoder.buttons, key_labels[player_id]))
+        return events
 
-    try:
-        connected_controllers = detect_controllers()
-        
-        if not connected_controllers:
-            print("No controllers found. Exiting.")
+    def cancel_actions(player_id):
+        # Macro tocando e turbo ligado param na hora, sem deixar tecla presa
+        for action in player_actions[player_id].values():
+            stats.players[player_id].events += action.cancel()
+
+    def release_all():
+        for player_id in range(len(previous_pressed)):
+            apply_state(0, player_id)
+            cancel_actions(player_id)
+            if shared is not None:
+                shared.publish(player_id, 0, stats.players[player_id])
+
+    def process_reports(reports, player_id, t_read):
+        decoder = decoders[player_id]
+        player_stats = stats.players[player_id]
+        if capture is not None:
+            for report in reports:
+                capture.write(player_id, report, t_read)
+        # Cada relatório é decodificado sobre o anterior (histerese dos eixos)
+        # e, se ligado, passa pelo debounce antes de virar tecla
+        debouncer = debouncers[player_id]
+        states = []
+        pressed = last_decoded[player_id]
+        for report in reports:
+            pressed = decoder.decode(report, pressed)
+            states.append(pressed if debouncer is None else debouncer.filter(pressed, t_read))
+        last_decoded[player_id] = pressed
+        t_decode = time.perf_counter_ns()
+        player_stats.reports += len(reports)
+        player_stats.decode.record(t_decode - t_read)
+
+        if debouncer is not None:
+            player_stats.suppressed = debouncer.total_suppressed
+            # A latência conta desde o primeiro relatório da mudança, com a espera do debounce
+            t_first = min(t_read, debouncer.confirmed_from or t_read)
+        else:
+            t_first = t_read
+
+        # Compara com a entrada crua: previous_pressed já está sem os botões de camada e de combinação
+        for pressed in coalesce(player_input[player_id], states, coalesce_stats[player_id]):
+            events = apply_state(pressed, player_id)
+            if events:
+                t_emit = time.perf_counter_ns()
+                player_stats.events += events
+                player_stats.emit.record(t_emit - t_decode)
+                player_stats.total.record(t_emit - t_first)
+        if shared is not None:
+            shared.publish(player_id, previous_pressed[player_id], player_stats)
+
+    def release_player(player_id):
+        last_decoded[player_id] = 0
+        if debouncers[player_id] is not None:
+            debouncers[player_id].reset()
+        apply_state(0, player_id)
+        cancel_actions(player_id)
+        if shared is not None:
+            shared.publish(player_id, 0, stats.players[player_id])
+
+    def apply_swaps():
+        # Troca o perfil de cada jogador de uma vez, entre relatórios (ver install_layer),
+        # mantendo a camada atual pelo nome se ela ainda existir
+        nonlocal active_debouncers
+        for player_id in list(pending_swaps):
+            setup = pending_swaps.pop(player_id)
+            old_buttons = decoders[player_id].buttons
+            new_bits = {button: bit for bit, button in enumerate(setup['decoder'].buttons)}
+
+            def remap(mask):
+                bits = 0
+                for bit in iter_bits(mask):
+                    new_bit = new_bits.get(old_buttons[bit])
+                    if new_bit is not None:
+                        bits |= 1 << new_bit
+                return bits
+
+            old_table = player_setups[player_id]['table']
+            table = setup['table']
+            names = table.names if table is not None else (BASE_LAYER,)
+            old_names = old_table.names if old_table is not None else (BASE_LAYER,)
+            active = old_names[active_layers[player_id]]
+            latched = old_names[latched_layers[player_id]]
+            layer = names.index(active) if active in names else 0
+
+            events = install_layer(player_id, setup['layers'][layer], new_bits)
+            held = remap(player_input[player_id])
+            raw = remap(last_decoded[player_id])
+            decoders[player_id] = setup['decoder']
+            debouncers[player_id] = setup['debouncer']
+            if setup['debouncer'] is not None:
+                setup['debouncer'].stable = held
+            last_decoded[player_id] = raw
+            player_setups[player_id] = setup
+            control_masks[player_id] = table.control_mask if table is not None else 0
+            active_layers[player_id] = layer
+            latched_layers[player_id] = names.index(latched) if latched in names else 0
+            last_control[player_id] = held & control_masks[player_id]
+            suppressed_chords[player_id] = remap(suppressed_chords[player_id])
+            # Aperta as teclas novas dos botões que continuam segurados
+            events += apply_state(held, player_id)
+            stats.players[player_id].events += events
+            if shared is not None:
+                shared.publish(player_id, previous_pressed[player_id], stats.players[player_id])
+        active_debouncers = [(player_id, d) for player_id, d in enumerate(debouncers) if d is not None]
+
+    def next_deadline():
+        if pending_swaps:
+            return 0
+        deadline = scheduler.next_deadline() if scheduler.heap else None
+        for _, debouncer in active_debouncers:
+            due = debouncer.next_deadline()
+            if due is not None and (deadline is None or due < deadline):
+                deadline = due
+        return deadline
+
+    def run_timers(t_now, idle):
+        if pending_swaps:
+            apply_swaps()
+        if scheduler.heap:
+            scheduler.run_due(t_now)
+        if not idle:
             return
+        # Confirma mudanças do debounce que venceram sem relatório novo
+        for player_id, debouncer in active_debouncers:
+            if not debouncer.pending:
+                continue
+            state = debouncer.flush(t_now)
+            if state != player_input[player_id]:
+                events = apply_state(state, player_id)
+                if events:
+                    player_stats = stats.players[player_id]
+                    player_stats.events += events
+                    player_stats.total.record(time.perf_counter_ns() - debouncer.confirmed_from)
+                    if shared is not None:
+                        shared.publish(player_id, state, player_stats)
+
+    supervisors = []
+
+    def claimed_paths():
+        return {supervisor.target['path'] for supervisor in supervisors if supervisor.connected}
+
+    # Hot-reload: o que montou cada jogador, para o watcher saber o que mudou
+    sources = [(store.profile(target), key_map_for(player_id), player_layers(settings, player_id),
+                player_debounce(settings, player_id))
+               for player_id, target in enumerate(targets)]
+    watched = {'store': store, 'settings': settings}
+
+    def check_config(changed):
+        # Roda na thread do watcher: arquivo e compilação ficam todos aqui, fora do emissor
+        # Erro de leitura sobe para o watcher: fica tudo como está e ele tenta de novo
+        if SETTINGS_PATH in changed:
+            watched['settings'] = load_settings(SETTINGS_PATH, strict=True)
+        if PATH_JSON in changed:
+            watched['store'] = load_profiles(PATH_JSON)
+        new_key_maps = player_key_maps(watched['settings'], PLAYER_KEY_MAPS)
+        updates = []
+        for player_id, supervisor in enumerate(supervisors):
+            profile = watched['store'].profile(supervisor.target)
+            decoder = watched['store'].decoder(supervisor.target)
+            if profile is None or profile == sources[player_id][0]:
+                # Sem perfil novo (ou o mesmo): continua com o decoder atual
+                profile = sources[player_id][0]
+                decoder = decoders[player_id]
+            key_map = new_key_maps[player_id] if player_id < len(new_key_maps) else {}
+            layer_config = player_layers(watched['settings'], player_id)
+            debounce_config = player_debounce(watched['settings'], player_id)
+            source = (profile, key_map, layer_config, debounce_config)
+            if source == sources[player_id]:
+                continue
+            try:
+                setup = player_setup(decoder, key_map, layer_config, debounce_config,
+                                     output, scheduler, stats.players[player_id])
+            except (ValueError, TypeError) as ex:
+                # sources fica como estava: o watcher tenta de novo e o erro volta a aparecer
+                raise ValueError(f"player {player_id + 1}: {ex}") from None
+            updates.append((player_id, source, setup))
+        # Só troca depois que todos compilaram: um erro no meio não deixa metade dos jogadores na config nova
+        for player_id, source, setup in updates:
+            sources[player_id] = source
+            pending_swaps[player_id] = setup
+        if updates:
+            if _wake_emitter is not None:
+                _wake_emitter(WAKE)
+            print(f"Reloaded profiles for players {', '.join(str(player_id + 1) for player_id, _, _ in updates)}")
+
+    # Perfis passados direto (benchmarks, replay) não têm arquivo para vigiar
+    watcher = ConfigWatcher([PATH_JSON, SETTINGS_PATH], check_config) if profiles is None else None
+
+    try:
+        if watcher is not None:
+            watcher.start()
+            _reload_now = watcher.poke
+        characteristics = load_characteristics(DEVICES_PATH)
+        for player_id, target in enumerate(targets):
+            strategy = read_strategy(characteristics_for(characteristics, target), mode, POLL_INTERVAL)
+            supervisor = DeviceSupervisor(player_id, target, strategy['read'] == 'polling',
+                                          stats.players[player_id], strategy)
+            supervisors.append(supervisor)
+            try:
+                supervisor.open()
+                print(f"Player {player_id + 1} Ready: {target['name']} ({strategy['read']} reads, {strategy['reason']})")
+                if not any(key_specs[player_id]):
+                    print(f"Warning: Player {player_id + 1} has no key map. Add one to {SETTINGS_PATH}")
+            except READ_ERRORS as ex:
+                supervisor.fail(ex)
+                if mode == 'polling':
+                    supervisor.start_reconnect(stop_event, claimed_paths)
+
+        print(f"\nRunning in {mode} mode... (Press Stop to halt)")
+        bus.publish(Ready('translator', len(supervisors), time.perf_counter_ns()))
 
-        limit = min(len(connected_controllers), len(loaded_profiles), 2)
-        
-        for player_id in range(limit):
-            target = connected_controllers[player_id]
-            gamepad = hid.device()
-            gamepad.open_path(target['path'])
-            gamepad.set_nonblocking(True)
-            open_gamepads.append(gamepad)
-            
-            print(f"Player {player_id + 1} Ready: {target['name']}")
-
-        print("\nRunning... (Press Stop to halt)")
-        
-        while is_running:
-            for player_id, gamepad in enumerate(open_gamepads):
-                data = gamepad.read(64)
-                if data:
-                    process_inputs(data, player_id)
-            time.sleep(0.005)
+        if mode == 'polling':
+            run_polling(supervisors, process_reports, release_player, claimed_paths, next_deadline, run_timers)
+        else:
+            run_threaded(supervisors, process_reports, release_player, claimed_paths, next_deadline, run_timers)
 
     except IOError as ex:
         print(f"Connection Error: {ex}")
+        bus.publish(ErrorEvent('translator', 'connection', str(ex)))
     finally:
-        for gamepad in open_gamepads:
-            gamepad.close()
-        print("Translator stopped.")
\ No newline at end of file
+        if watcher is not None:
+            _reload_now = None
+            watcher.stop()
+            watcher.join()
+        # Nenhuma tecla fica presa depois do Stop
+        release_all()
+        output.close()
+        if capture is not None:
+            capture.close()
+            print(f"Captured {capture.records} reports in {capture_path}")
+        stop_event.set()
+        for supervisor in supervisors:
+            if supervisor.reconnect_thread is not None:
+                supervisor.reconnect_thread.join()
+            supervisor.close()
+        active_devices = []
+        for player_id in range(len(supervisors)):
+            print(f"Player {player_id + 1} input: {coalesce_stats[player_id]}")
+            if debouncers[player_id] is not None:
+                print(f"Player {player_id + 1} debounce: {debouncers[player_id].summary()}")
+        for line in stats.summary_lines(len(supervisors)):
+            print(line)
+        if stats_path:
+            try:
+                stats.export(stats_path)
+                print(f"Latency stats saved in {stats_path}")
+            except OSError as ex:
+                print(f"Could not save latency stats: {ex}")
+        print("Translator stopped.")
+        bus.publish(Stopped('translator'))
\ No newline at end of file
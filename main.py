@@ -1,13 +1,17 @@
 import sys
 import os
-import json
 import threading
+import collections
+import multiprocessing
 import customtkinter as ctk
 
 try:
     from engines import configurator
     from engines import translator
-    from engines.controllerGetter import detect_controllers
+    from engines.events import (CalibrationStep, DeviceAdded, DeviceRemoved, ErrorEvent, LayerChanged,
+                                PlayerDisconnected, PlayerReconnected, Started, StateChanged, Stopped, bus)
+    from engines.monitor import DeviceMonitor, ProfileCache
+    from engines.engineprocess import EngineProcess
     ENGINES_LOADED = True
     PATH_JSON = configurator.PATH_JSON
 
@@ -16,16 +20,28 @@ except ImportError:
     ENGINES_LOADED = False
     PATH_JSON = "profiles.json"
 
-    def detect_controllers():
-        return []
-
     class MockEngine:
         is_running = False
         def start_multiplayer_calibration(self): pass
-        def start_translator(self): pass
+        def start_translator(self, **kwargs): pass
+        def stop_translator(self): pass
+
+    class MockBus:
+        def drain(self): return []
+
+    class DeviceMonitor:
+        devices = []
+        paused = False
+        def start(self): pass
+
+    class ProfileCache:
+        def __init__(self, path): pass
+        def get(self): return []
+        def calibrated(self, devices): return 0
 
     configurator = MockEngine()
     translator = MockEngine()
+    bus = MockBus()
 
 # -------------------------------------------------------------
 # PALETA DE CORES RETRO & FONTES
@@ -38,15 +54,63 @@ FG_CYAN = "#00f3ff"        # Ciano Neon
 FG_YELLOW = "#ffe600"      # Amarelo Alerta
 FG_GRAY = "#888888"        # Cinza Texto
 
+# A interface lê eventos e log em lote, uma vez por frame (~30 fps)
+FRAME_MS = 33
+
+# Log do sistema: no máximo LOG_MAX_LINES linhas na tela; linhas ainda não
+# desenhadas ficam num buffer circular de LOG_BUFFER_LINES
+LOG_MAX_LINES = 1000
+LOG_BUFFER_LINES = 2000
+# Se definido, o histórico completo do log também vai para este arquivo
+LOG_FILE_PATH = None
+
+# 'thread': calibração e tradução em threads dentro deste processo (como sempre foi)
+# 'process': num processo separado (engines/engineprocess.py); a interface só lê o
+# estado ao vivo da memória compartilhada e não disputa o GIL com o loop quente
+ENGINE_MODE = 'thread'
+
 try:
     FONT_FAMILY = "Courier New" 
 except:
     FONT_FAMILY = "Courier"
 
 # -------------------------------------------------------------
-# PARSER DO TERMINAL (O Cérebro Visual)
+# LOG DO SISTEMA (buffer circular + arquivo opcional)
+# -------------------------------------------------------------
+class SystemLog:
+    def __init__(self, capacity, file_path=None):
+        self.lines = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.file = open(file_path, 'a', encoding='utf-8') if file_path else None
+
+    def append(self, line):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+        # O arquivo guarda tudo, mesmo o que o buffer da tela descartar
+        if self.file:
+            self.file.write(line + '\n')
+
+    def take(self):
+        batch = []
+        popleft = self.lines.popleft
+        try:
+            while True:
+                batch.append(popleft())
+        except IndexError:
+            pass
+        if self.dropped:
+            batch.insert(0, f"... {self.dropped} log lines skipped ...")
+            self.dropped = 0
+        if batch and self.file:
+            self.file.flush()
+        return batch
+
+
+# -------------------------------------------------------------
+# TERMINAL (stdout vira linhas de log, desenhadas a cada frame)
 # -------------------------------------------------------------
-class RetroTerminalParser:
+class RetroTerminal:
     def __init__(self, app_gui):
         self.app_gui = app_gui
         self.buffer = ""
@@ -55,62 +119,13 @@ class RetroTerminalParser:
         self.buffer += text
         while '\n' in self.buffer:
             line, self.buffer = self.buffer.split('\n', 1)
-            self.process_line(line.strip())
+            line = line.strip()
+            if line:
+                self.app_gui.system_log.append(line)
 
     def flush(self):
         pass
 
-    def process_line(self, line):
-        if not line: return
-
-        # 1. LOG GERAL
-        self.app_gui.after(0, self.app_gui.add_to_system_log, line)
-
-        # 2. CAPTURA DE ERROS (Libera a interface se der erro)
-        if "not found!" in line or "Error:" in line:
-            self.app_gui.is_busy = False
-            self.app_gui.after(0, self.app_gui.show_action_screen, "FILE MISSING", FG_RED)
-            
-        elif "Please run 'Calibrate" in line:
-            self.app_gui.is_busy = False
-            self.app_gui.after(0, self.app_gui.show_action_screen, "MUST CALIBRATE", FG_YELLOW)
-
-        # 3. AÇÃO IMEDIATA (Comandos normais)
-        elif "PRESS AND HOLD" in line:
-            button = line.split("[")[-1].replace("]", "")
-            self.app_gui.after(0, self.app_gui.show_action_screen, f"HOLD: {button}", FG_YELLOW)
-            
-        elif "RELEASE the button" in line:
-            self.app_gui.after(0, self.app_gui.show_action_screen, "RELEASE NOW", FG_CYAN)
-            
-        elif "Idle state captured" in line:
-            self.app_gui.after(0, self.app_gui.show_action_screen, "IDLE OK", FG_GREEN)
-            
-        elif "All connected controllers calibrated" in line:
-            self.app_gui.is_busy = False # Libera a interface ao terminar a calibração
-            self.app_gui.after(0, self.app_gui.show_action_screen, "CALIBRATION DONE", FG_GREEN)
-
-        elif "SETTING UP PLAYER" in line:
-            player_num = line.split("PLAYER")[-1].strip().replace("-", "").strip()
-            self.app_gui.after(0, self.app_gui.show_action_screen, f"PLAYER {player_num}", FG_CYAN)
-
-        elif "Starting Configuration" in line:
-            self.app_gui.after(0, self.app_gui.update_sidebar_status, "CALIBRATING...", FG_CYAN)
-            self.app_gui.after(0, self.app_gui.show_action_screen, "INITIALIZING...", FG_GRAY)
-
-        elif "Starting Universal" in line:
-             self.app_gui.after(0, self.app_gui.update_sidebar_status, "ACTIVE - RUNNING", FG_GREEN)
-             self.app_gui.after(0, self.app_gui.show_action_screen, "AWAITING INPUT", FG_GRAY)
-
-        elif "Pressed ->" in line:
-            parts = line.split("Pressed")
-            btn_info = parts[0].strip() 
-            self.app_gui.after(0, self.app_gui.show_action_screen, f"{btn_info} INPUT", FG_GREEN)
-
-        elif "stopped" in line.lower() and "calib" not in line.lower():
-             self.app_gui.is_busy = False # Libera a interface ao apertar Stop
-             self.app_gui.after(0, self.app_gui.show_action_screen, "SYSTEM STOPPED", FG_RED)
-
 
 # -------------------------------------------------------------
 # FRONTEND CLASS
@@ -121,6 +136,13 @@ class UniversalGamepadUI(ctk.CTk):
         
         # --- Variável exclusiva do Frontend para controlar se ele está ocupado ---
         self.is_busy = False 
+        self.system_log = SystemLog(LOG_BUFFER_LINES, LOG_FILE_PATH)
+        # Enumeração em segundo plano e perfis em cache: o heartbeat fica quase de graça
+        self.device_monitor = DeviceMonitor()
+        self.profile_cache = ProfileCache(PATH_JSON)
+        self.engine = EngineProcess() if ENGINES_LOADED and ENGINE_MODE == 'process' else None
+        # Nomes dos botões de cada jogador (vêm nos StateChanged), para mostrar o que está apertado
+        self.player_buttons = {}
         
         self.title("Universal Controller HUB")
         self.geometry("850x550") 
@@ -130,15 +152,21 @@ class UniversalGamepadUI(ctk.CTk):
         self.center_window()
         self.setup_layout()
         
-        sys.stdout = RetroTerminalParser(self)
+        sys.stdout = RetroTerminal(self)
         
         print("--- SYSTEM BOOT SEQUENCE INITIATED ---")
         print("--- CREATOR:  github.com/joaopege1 ---")
         print(f"OS detected: {sys.platform}")
         print(f"Targeting profile path: {PATH_JSON}")
+        if self.engine is not None:
+            print(f"Engine process started (pid {self.engine.process.pid})")
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Inicia o Heartbeat (Monitoramento contínuo do arquivo)
+        self.device_monitor.start()
         self.check_system_health()
+        # Inicia o loop de frames (eventos dos engines + log)
+        self.ui_frame()
 
     def center_window(self):
         self.update_idletasks()
@@ -185,6 +213,14 @@ class UniversalGamepadUI(ctk.CTk):
         )
         self.status_indicator.pack(pady=10)
 
+        # Latência ao vivo do tradutor (p50/p99 e relatórios por segundo)
+        self.stats_lbl = ctk.CTkLabel(
+            self.sidebar, text="",
+            font=ctk.CTkFont(family=FONT_FAMILY, size=10),
+            text_color=FG_GRAY, justify="left"
+        )
+        self.stats_lbl.pack(padx=15, anchor="w")
+
         btn_style = {
             "font": ctk.CTkFont(family=FONT_FAMILY, size=14, weight="bold"),
             "height": 45, 
@@ -255,18 +291,14 @@ class UniversalGamepadUI(ctk.CTk):
     # LÓGICA DE UPDATE DA UI (Heartbeat System 2.0)
     # -------------------------------------------------------------
     def check_system_health(self):
+        # Enquanto calibra ou traduz, o monitor não enumera (igual ao heartbeat antigo)
+        self.device_monitor.paused = self.is_busy
         if not self.is_busy:
-            controllers = detect_controllers()
+            controllers = self.device_monitor.devices
             no_controller = len(controllers) == 0
             self.control_lbl.configure(text=f"[{len(controllers)} CONTROLLERS FOUND]")
 
-            calibrated_count = 0
-            if os.path.exists(PATH_JSON):
-                try:
-                    with open(PATH_JSON) as f:
-                        calibrated_count = len(json.load(f))
-                except (json.JSONDecodeError, OSError):
-                    calibrated_count = 0
+            calibrated_count = self.profile_cache.calibrated(controllers)
 
             if no_controller:
                 self.update_sidebar_status("NO CONTROLLER DETECTED", FG_RED)
@@ -291,16 +323,150 @@ class UniversalGamepadUI(ctk.CTk):
                 self.btn_calib.configure(state="normal", fg_color="#222200", border_color=FG_YELLOW, text_color=FG_YELLOW)
 
 
+        self.update_latency_stats()
+
         # Chama a si mesmo a cada 1 segundo indefinidamente
         self.after(1000, self.check_system_health)
 
+    def update_latency_stats(self):
+        if self.engine is not None:
+            self.update_shared_stats()
+            return
+        stats = getattr(translator, 'stats', None)
+        if stats is None:
+            return
+        lines = []
+        for entry in stats.snapshot()['players']:
+            total = entry['total']
+            lines.append(f"P{entry['player']} p50 {total['p50_us'] / 1000:.2f}ms p99 {total['p99_us'] / 1000:.2f}ms")
+            lines.append(f"   {entry['reports_per_s']:.0f} rep/s {entry['events_per_s']:.0f} ev/s")
+        self.stats_lbl.configure(text="\n".join(lines))
+
+    def update_shared_stats(self):
+        # Modo processo: lê direto da memória compartilhada, sem pedir nada ao engine
+        players, session = self.engine.shared.header()
+        if not session:
+            return
+        lines = []
+        for player_id in range(players):
+            latency = self.engine.shared.read_latency(player_id)
+            state = self.engine.shared.read_state(player_id)
+            if latency is None or state is None:
+                continue
+            p50_us, p99_us, reports_per_s, events_per_s = latency
+            lines.append(f"P{player_id + 1} p50 {p50_us / 1000:.2f}ms p99 {p99_us / 1000:.2f}ms")
+            lines.append(f"   {reports_per_s:.0f} rep/s {events_per_s:.0f} ev/s")
+            buttons = self.player_buttons.get(player_id, ())
+            held = [button for bit, button in enumerate(buttons) if state[0] >> bit & 1]
+            if held:
+                lines.append(f"   held: {' '.join(held)}")
+        self.stats_lbl.configure(text="\n".join(lines))
+
+    # -------------------------------------------------------------
+    # LOOP DE FRAMES (eventos dos engines em lote)
+    # -------------------------------------------------------------
+    def ui_frame(self):
+        for event in bus.drain():
+            self.handle_event(event)
+        if self.engine is not None:
+            events, lines = self.engine.poll()
+            for line in lines:
+                self.system_log.append(line)
+            for event in events:
+                self.handle_event(event)
+
+        self.flush_system_log()
+
+        self.after(FRAME_MS, self.ui_frame)
+
+    def handle_event(self, event):
+        if isinstance(event, StateChanged):
+            self.player_buttons[event.player] = event.buttons
+            player = f"[P{event.player + 1}]"
+            for bit, button in enumerate(event.buttons):
+                if not event.changed >> bit & 1:
+                    continue
+                if event.pressed >> bit & 1:
+                    self.system_log.append(f"{player} {button} Pressed -> Key '{event.keys[bit]}'")
+                    self.show_action_screen(f"{player} {button} INPUT", FG_GREEN)
+                else:
+                    self.system_log.append(f"{player} {button} Released")
+
+        elif isinstance(event, CalibrationStep):
+            if event.phase == 'player':
+                self.show_action_screen(f"PLAYER {event.player + 1}", FG_CYAN)
+            elif event.phase == 'idle':
+                self.show_action_screen("IDLE OK", FG_GREEN)
+            elif event.phase == 'hold':
+                # Na calibração paralela vários jogadores andam juntos: mostra de quem é o passo
+                self.show_action_screen(f"P{event.player + 1} HOLD: {event.button.upper()}", FG_YELLOW)
+            elif event.phase == 'release':
+                self.show_action_screen(f"P{event.player + 1} RELEASE NOW", FG_CYAN)
+            elif event.phase == 'verify':
+                self.show_action_screen(f"P{event.player + 1} PRESS: {event.button.upper()}", FG_YELLOW)
+            elif event.phase == 'verified':
+                self.show_action_screen(f"P{event.player + 1} PROFILE OK", FG_GREEN)
+            elif event.phase == 'done':
+                self.is_busy = False # Libera a interface ao terminar a calibração
+                self.show_action_screen("CALIBRATION DONE", FG_GREEN)
+
+        elif isinstance(event, DeviceAdded):
+            self.system_log.append(f"Controller connected: {event.device['name']}")
+
+        elif isinstance(event, DeviceRemoved):
+            self.system_log.append(f"Controller disconnected: {event.device['name']}")
+
+        elif isinstance(event, PlayerDisconnected):
+            # Só este jogador caiu: o tradutor continua rodando para os outros
+            self.show_action_screen(f"P{event.player + 1} DISCONNECTED", FG_RED)
+
+        elif isinstance(event, PlayerReconnected):
+            self.show_action_screen(f"P{event.player + 1} BACK ({event.reconnect_ms:.0f}ms)", FG_GREEN)
+
+        elif isinstance(event, LayerChanged):
+            self.show_action_screen(f"P{event.player + 1} LAYER: {event.layer.upper()}", FG_CYAN)
+
+        elif isinstance(event, ErrorEvent):
+            # Libera a interface se der erro
+            self.is_busy = False
+            if event.kind == 'missing_profiles':
+                self.show_action_screen("MUST CALIBRATE", FG_YELLOW)
+            elif event.kind == 'no_controllers':
+                self.show_action_screen("NO CONTROLLER", FG_RED)
+            elif event.kind == 'config':
+                self.show_action_screen("CHECK SETTINGS", FG_YELLOW)
+            else:
+                self.show_action_screen("ERROR", FG_RED)
+
+        elif isinstance(event, Started):
+            if event.source == 'translator':
+                self.update_sidebar_status("ACTIVE - RUNNING", FG_GREEN)
+                self.show_action_screen("AWAITING INPUT", FG_GRAY)
+            else:
+                self.update_sidebar_status("CALIBRATING...", FG_CYAN)
+                self.show_action_screen("INITIALIZING...", FG_GRAY)
+
+        elif isinstance(event, Stopped):
+            self.is_busy = False # Libera a interface ao apertar Stop
+            if event.source == 'translator':
+                self.show_action_screen("SYSTEM STOPPED", FG_RED)
+            else:
+                self.show_action_screen("CALIBRATION STOPPED", FG_RED)
+
     def update_sidebar_status(self, text, color):
         self.status_indicator.configure(text=f"STATUS: {text}", text_color=color)
 
-    def add_to_system_log(self, text):
+    def flush_system_log(self):
+        lines = self.system_log.take()
+        if not lines:
+            return
+        # Um único insert por frame, depois corta as linhas mais antigas
         self.log_box.configure(state="normal")
-        self.log_box.insert("end", f"{text}\n")
-        self.log_box.see("end") 
+        self.log_box.insert("end", "\n".join(lines) + "\n")
+        line_count = int(self.log_box.index("end-1c").split(".")[0]) - 1
+        if line_count > LOG_MAX_LINES:
+            self.log_box.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+        self.log_box.see("end")
         self.log_box.configure(state="disabled")
 
     def show_action_screen(self, text, color):
@@ -312,6 +478,10 @@ class UniversalGamepadUI(ctk.CTk):
     def run_calibrator(self):
         if not ENGINES_LOADED: return
         self.is_busy = True # Informa a UI que agora o usuário está fazendo algo
+        if self.engine is not None:
+            print("\n>>> SENDING CALIBRATION TO ENGINE PROCESS <<<")
+            self.engine.calibrate()
+            return
         print("\n>>> INITIALIZING CALIBRATION THREAD <<<")
         thread = threading.Thread(target=configurator.start_multiplayer_calibration, daemon=True)
         thread.start()
@@ -325,20 +495,35 @@ class UniversalGamepadUI(ctk.CTk):
             return
 
         self.is_busy = True # Informa a UI que o jogo começou
+        stats_path = os.path.join(os.path.dirname(PATH_JSON), 'latency_stats.json')
+        if self.engine is not None:
+            print("\n>>> SENDING TRANSLATOR TO ENGINE PROCESS <<<")
+            self.engine.translate(stats_path=stats_path)
+            return
         print("\n>>> INITIALIZING TRANSLATOR THREAD <<<")
-        thread = threading.Thread(target=translator.start_translator, daemon=True)
+        thread = threading.Thread(target=translator.start_translator, kwargs={'stats_path': stats_path}, daemon=True)
         thread.start()
 
     def emergency_stop(self):
         print("\n!!! EMERGENCY STOP SIGNAL SENT !!!")
         self.is_busy = False # Libera a UI de volta para o modo ocioso
-        if ENGINES_LOADED:
+        if self.engine is not None:
+            self.engine.stop()
+        elif ENGINES_LOADED:
             # Envia o sinal para o seu backend parar os loops "while"
             configurator.is_running = False
-            translator.is_running = False
+            translator.stop_translator()
         self.show_action_screen("STOPPING...", FG_RED)
 
+    def on_close(self):
+        # O engine solta as teclas e sai antes da janela fechar
+        if self.engine is not None:
+            self.engine.close()
+        self.destroy()
+
 if __name__ == "__main__":
+    # Necessário para o processo do engine no app empacotado (PyInstaller)
+    multiprocessing.freeze_support()
     app = UniversalGamepadUI()
     app.mainloop()
     
\ No newline at end of file
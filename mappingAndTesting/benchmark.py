@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Permite rodar direto: python3 mappingAndTesting/benchmark.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engines import hidbackend, translator
+from engines.controllerGetter import detect_controllers
+from engines.engineprocess import EngineProcess
+from engines.events import Stopped
+from engines.hidsim import PATTERNS, SimulatedHID, sim_profile
+from engines.latency import LatencyHistogram
+from engines.outputs import NullBackend
+from engines.reportrate import measure_devices, save_characteristics
+
+
+DEFAULT_KEY_MAP = dict(translator.PLAYER_KEY_MAPS[0])
+# Carga de interface simulada: um "frame" a cada FRAME_S com Python puro segurando o GIL
+FRAME_S = 0.033
+
+
+class Discard:
+    # Os prints do tradutor não entram na medição do terminal
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def setup_case(controllers, args):
+    # Roda no processo do tradutor: o deste script ou, com --isolated, o do engine
+    sim = SimulatedHID(controllers=controllers, rate_hz=args.rate, pattern=args.pattern, hold=args.hold,
+                       jitter=args.jitter, bounce=args.bounce)
+    hidbackend.use_backend(sim)
+    # Todo jogador emite teclas, independente do settings.json local
+    translator.SETTINGS_PATH = None
+    translator.DEVICES_PATH = None
+    if args.measure:
+        # Mede os controles simulados como o cli.py measure-devices faria
+        with contextlib.redirect_stdout(Discard()):
+            characteristics, _ = measure_devices(detect_controllers(max_age=0), args.measure)
+        translator.DEVICES_PATH = os.path.join(tempfile.gettempdir(), f'benchmark-devices-{os.getpid()}.json')
+        save_characteristics(translator.DEVICES_PATH, characteristics)
+    key_map = DEFAULT_KEY_MAP
+    if args.turbo_hz:
+        key_map = {button: {'key': key, 'turbo_hz': args.turbo_hz} for button, key in DEFAULT_KEY_MAP.items()}
+    translator.PLAYER_KEY_MAPS = [key_map] * controllers
+    return sim
+
+
+def ui_load(stop_event, busy_ms):
+    # Imita a interface: redesenho e log são Python puro que segura o GIL por alguns ms a cada frame
+    while not stop_event.is_set():
+        end = time.perf_counter() + busy_ms / 1000
+        while time.perf_counter() < end:
+            str(list(range(100)))
+        stop_event.wait(FRAME_S)
+
+
+def run_case(controllers, mode, args):
+    profiles = [sim_profile(axes=not args.digital_dpad, jitter=args.jitter) for _ in range(controllers)]
+    options = {'mode': mode, 'profiles': profiles, 'debounce': {
+        'mode': args.debounce, 'ms': args.debounce_ms, 'reports': args.debounce_reports,
+        'budget_ms': args.debounce_budget_ms,
+    }}
+    load_stop = threading.Event()
+    load = threading.Thread(target=ui_load, args=(load_stop, args.ui_load_ms), daemon=True)
+
+    if args.isolated:
+        sim = None
+        engine = EngineProcess(setup=(setup_case, controllers, args))
+        if args.ui_load_ms:
+            load.start()
+        wall_start = time.perf_counter()
+        engine.translate(backend='null', **options)
+        time.sleep(args.duration)
+        engine.stop()
+        stopped = False
+        while not stopped:
+            events, _ = engine.poll()
+            stopped = any(isinstance(event, Stopped) for event in events)
+            time.sleep(0.01)
+        wall = time.perf_counter() - wall_start
+        stats, cpu = engine.fetch_stats()
+        engine.close()
+        events_sent = sum(player.events for player in stats.players)
+    else:
+        sim = setup_case(controllers, args)
+        output = NullBackend()
+        worker = threading.Thread(target=translator.start_translator, kwargs=dict(options, backend=output))
+        with contextlib.redirect_stdout(Discard()):
+            if args.ui_load_ms:
+                load.start()
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            worker.start()
+            time.sleep(args.duration)
+            translator.stop_translator()
+            worker.join()
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+        stats = translator.stats
+        events_sent = output.presses + output.releases
+    load_stop.set()
+
+    pipeline = LatencyHistogram()
+    for player in stats.players:
+        pipeline.merge(player.total)
+    # A idade dos relatórios é medida pelos controles simulados, que ficam no outro processo com --isolated
+    age = None
+    if sim is not None:
+        age = LatencyHistogram()
+        for controller in sim.controllers:
+            age.merge(controller.age)
+    reports = sum(player.reports for player in stats.players)
+
+    return {
+        'mode': mode,
+        'controllers': controllers,
+        'isolated': args.isolated,
+        'ui_load_ms': args.ui_load_ms,
+        'players': sum(1 for player in stats.players if player.reports),
+        'reports_per_s': round(reports / wall, 1),
+        'events_per_s': round(events_sent / wall, 1),
+        'cpu_us_per_report': round(cpu / reports * 1e6, 1) if reports else None,
+        'cpu_percent': round(cpu / wall * 100, 1),
+        'age_p50_us': round(age.percentile(50) / 1000, 1) if age else '-',
+        'age_p99_us': round(age.percentile(99) / 1000, 1) if age else '-',
+        'pipeline_p50_us': round(pipeline.percentile(50) / 1000, 1),
+        'pipeline_p95_us': round(pipeline.percentile(95) / 1000, 1),
+        'pipeline_p99_us': round(pipeline.percentile(99) / 1000, 1),
+        'pipeline_max_us': round(pipeline.max / 1000, 1),
+        'overflowed': sum(controller.overflowed for controller in sim.controllers) if sim else '-',
+        'suppressed': sum(player.suppressed for player in stats.players),
+        'timer_late': stats.snapshot().get('timer_late'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translator benchmark on simulated HID controllers (no USB hardware needed).")
+    parser.add_argument('--controllers', type=int, nargs='+', default=[1, 2, 4, 8, 32])
+    parser.add_argument('--modes', nargs='+', default=['threaded', 'polling'], choices=['threaded', 'polling', 'auto'])
+    parser.add_argument('--duration', type=float, default=3.0, help="seconds per case")
+    parser.add_argument('--rate', type=float, default=250, help="reports per second per controller")
+    parser.add_argument('--pattern', default='cycle', choices=sorted(PATTERNS))
+    parser.add_argument('--hold', type=int, default=8, help="reports per pattern step")
+    parser.add_argument('--jitter', type=int, default=0, help="axis bytes wobble by up to this much (cheap pads)")
+    parser.add_argument('--digital-dpad', action='store_true', help="decode the D-pad with the old bitmask profile")
+    parser.add_argument('--bounce', type=int, default=0, help="first N reports after each change flicker (bad contacts)")
+    parser.add_argument('--debounce', choices=['time', 'reports'], help="enable the debounce filter")
+    parser.add_argument('--debounce-ms', type=float, default=5)
+    parser.add_argument('--debounce-reports', type=int, default=2)
+    parser.add_argument('--debounce-budget-ms', type=float, default=10)
+    parser.add_argument('--turbo-hz', type=float, help="make every mapped button a turbo button at this rate")
+    parser.add_argument('--isolated', action='store_true', help="run the translator in its own engine process")
+    parser.add_argument('--ui-load-ms', type=float, default=0,
+                        help="busy the GIL of this process for N ms every 33 ms frame, like the GUI")
+    parser.add_argument('--measure', type=float, metavar='SECONDS',
+                        help="measure the simulated pads first, so each one gets its own read strategy")
+    parser.add_argument('--json', help="also save the results to this file")
+    args = parser.parse_args()
+
+    print(f"{'mode':<9}{'pads':>5}{'players':>8}{'reports/s':>11}{'events/s':>10}{'cpu%':>7}"
+          f"{'cpu/rep us':>11}{'age p50/p99 us':>17}{'pipe p50/p95/p99 us':>22}{'lost':>6}{'bounces':>9}")
+
+    results = []
+    for controllers in args.controllers:
+        for mode in args.modes:
+            r = run_case(controllers, mode, args)
+            results.append(r)
+            print(f"{r['mode']:<9}{r['controllers']:>5}{r['players']:>8}{r['reports_per_s']:>11}{r['events_per_s']:>10}"
+                  f"{r['cpu_percent']:>7}{str(r['cpu_us_per_report']):>11}"
+                  f"{r['age_p50_us']:>8}/{r['age_p99_us']:<8}"
+                  f"{r['pipeline_p50_us']:>8}/{r['pipeline_p95_us']}/{r['pipeline_p99_us']:<6}{r['overflowed']:>6}{r['suppressed']:>9}")
+            if r['timer_late']:
+                late = r['timer_late']
+                print(f"{'':<9}turbo timers: {late['count']} fired, late p50 {late['p50_us']}us "
+                      f"p99 {late['p99_us']}us max {late['max_us']}us")
+
+    print("\nage = time a report waited before being read; pipe = read -> key event.")
+    print("CPU includes the simulated devices themselves.")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=4)
+        print(f"Results saved in {args.json}")
+
+
+if __name__ == "__main__":
+    main()
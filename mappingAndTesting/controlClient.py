@@ -0,0 +1,42 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# Permite rodar direto: python3 mappingAndTesting/controlClient.py stats
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engines.control import CONTROL_SOCKET, send_command
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a command to a translator started with 'cli.py serve'.")
+    parser.add_argument('cmd', choices=['status', 'start', 'stop', 'reload', 'devices', 'stats', 'shutdown'])
+    parser.add_argument('--socket', default=CONTROL_SOCKET)
+    parser.add_argument('--mode', choices=['threaded', 'polling', 'auto'], help="start only")
+    parser.add_argument('--backend', choices=['pynput', 'null', 'recording'], help="start only")
+    parser.add_argument('--players', type=int, help="start only")
+    parser.add_argument('--compact', action='store_true', help="print the raw one-line reply")
+    args = parser.parse_args()
+
+    options = {}
+    if args.cmd == 'start':
+        options = {key: value for key, value in
+                   (('mode', args.mode), ('backend', args.backend), ('players', args.players)) if value is not None}
+    try:
+        response = send_command(args.cmd, args.socket, **options)
+    except OSError as ex:
+        print(f"Could not talk to {args.socket} ({ex}). Is 'cli.py serve' running?", file=sys.stderr)
+        return 2
+
+    if args.compact:
+        print(json.dumps(response, separators=(',', ':')))
+    elif response['ok']:
+        print(json.dumps(response['result'], indent=4))
+    else:
+        print(f"Error: {response['error']}", file=sys.stderr)
+    return 0 if response['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+
+# Permite rodar direto: python3 mappingAndTesting/layerCheck.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engines import hidbackend, translator
+from engines.events import LayerChanged, bus
+from engines.hidsim import SimulatedHID, sim_profile
+from engines.outputs import RecordingBackend
+
+# Confere camadas e combinações num controle simulado que só manda relatório quando algo muda
+# (o caso mais difícil: soltar um botão de segurar é o último relatório que chega).
+# Sai com código 1 se algum cenário não der o resultado esperado.
+RATE_HZ = 250
+STEP_REPORTS = 25
+PLAYER = {
+    'layers': {'menu': {'A': 'enter'}},
+    'hold': {'select': 'menu'},
+    'chords': {'L+R+start': 'menu'},
+}
+
+# (nome, botões apertados em cada passo, teclas esperadas, camadas esperadas)
+SCENARIOS = [
+    ("release hold button alone", [(), ('select',), ()], [], ['menu', 'base']),
+    ("release hold button while A is held", [(), ('select',), ('select', 'A'), ('A',), ()],
+     [('press', 'enter'), ('release', 'enter'), ('press', 'v'), ('release', 'v')], ['menu', 'base']),
+    ("release chord start first, then L+R", [(), ('L', 'R', 'start'), ('L', 'R'), (), ('L',), ()],
+     [('press', '1'), ('release', '1')], ['menu']),
+]
+
+
+class Discard:
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def run_scenario(steps, settings_path):
+    def pattern(step, controller):
+        return steps[min(step, len(steps) - 1)]
+
+    hidbackend.use_backend(SimulatedHID(controllers=1, rate_hz=RATE_HZ, pattern=pattern, hold=STEP_REPORTS,
+                                        only_changes=True))
+    output = RecordingBackend()
+    bus.drain()
+    worker = threading.Thread(target=translator.start_translator,
+                              kwargs={'backend': output, 'profiles': [sim_profile()]})
+    with contextlib.redirect_stdout(Discard()):
+        worker.start()
+        time.sleep((len(steps) + 2) * STEP_REPORTS / RATE_HZ)
+        translator.stop_translator()
+        worker.join()
+    keys = [(action, key) for _, action, key in output.events]
+    layers = [event.layer for event in bus.drain() if isinstance(event, LayerChanged)]
+    return keys, layers
+
+
+def main():
+    failed = 0
+    with tempfile.TemporaryDirectory() as folder:
+        settings_path = os.path.join(folder, 'settings.json')
+        with open(settings_path, 'w') as file:
+            json.dump({'players': [PLAYER]}, file)
+        translator.SETTINGS_PATH = settings_path
+        translator.DEVICES_PATH = None
+        for name, steps, expected_keys, expected_layers in SCENARIOS:
+            keys, layers = run_scenario(steps, settings_path)
+            ok = keys == expected_keys and layers == expected_layers
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}")
+            if not ok:
+                print(f"     keys   {keys} (expected {expected_keys})")
+                print(f"     layers {layers} (expected {expected_layers})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
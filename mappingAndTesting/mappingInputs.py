@@ -1,10 +1,20 @@
+import sys
 import hid
 import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from engines.capture import CaptureWriter
 
 # Estes são os IDs exatos da imagem que enviou
 VENDOR_ID = 0x0810
 PRODUCT_ID = 0x0001
 
+# Uso: python3 mappingInputs.py [sessao.hidtrace]
+# Com um arquivo, todos os relatórios crus (não só as mudanças) também são gravados
+CAPTURE_PATH = sys.argv[1] if len(sys.argv) > 1 else None
+capture = None
+
 print(f"Searching for the gamepad (VID: {hex(VENDOR_ID)}, PID: {hex(PRODUCT_ID)})...")
 
 try:
@@ -17,6 +27,10 @@ try:
 	
 	print("Connected!")
 
+	if CAPTURE_PATH:
+		capture = CaptureWriter(CAPTURE_PATH)
+		print(f"Capturing raw reports to {CAPTURE_PATH}")
+
 	# Guarda o último estado do comando (começa vazio)
 	last_report = None
 
@@ -26,6 +40,8 @@ try:
 	while True:
 		# Lê o pacote de dados do comando
 		report = gamepad.read(64)
+		if report and capture:
+			capture.write(0, report)
 		
 		# Se recebeu dados E esses dados forem diferentes dos últimos que vimos:
 		if report and report != last_report:
@@ -47,5 +63,8 @@ except IOError as ex:
 except KeyboardInterrupt:
     print("\nProgram terminated.")
 finally:
+    if capture:
+        capture.close()
+        print(f"{capture.records} reports saved in {CAPTURE_PATH}")
     if 'gamepad' in locals():
         gamepad.close()
@@ -0,0 +1,56 @@
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+# Permite rodar direto: python3 mappingAndTesting/replayTrace.py sessao.hidtrace
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engines import hidbackend, translator
+from engines.capture import CaptureReader, ReplayHID
+from engines.profiles import load_profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a .hidtrace capture through the translator.")
+    parser.add_argument('trace')
+    parser.add_argument('--speed', type=float, default=1.0, help="1 = original timing, 10 = ten times faster, 0 = no waiting")
+    parser.add_argument('--profile', default=translator.PATH_JSON, help="profiles.json to decode with")
+    parser.add_argument('--backend', default='null', choices=['null', 'recording', 'pynput'])
+    parser.add_argument('--mode', default=None, choices=['threaded', 'polling'])
+    parser.add_argument('--info', action='store_true', help="only print what is inside the trace")
+    args = parser.parse_args()
+
+    with CaptureReader(args.trace) as reader:
+        print(f"{args.trace}: {len(reader)} reports, {reader.width} bytes wide, "
+              f"controllers {reader.devices()}, {reader.duration_s():.1f}s long")
+    if args.info:
+        return
+
+    # O trace não guarda a identidade USB: os perfis valem pela ordem do arquivo
+    store = load_profiles(args.profile)
+    profiles = [entry['buttons'] for entry in store.entries] + store.legacy
+
+    replay = ReplayHID(args.trace, speed=args.speed)
+    hidbackend.use_backend(replay)
+
+    worker = threading.Thread(
+        target=translator.start_translator,
+        kwargs={'mode': args.mode, 'backend': args.backend, 'profiles': profiles},
+    )
+    started = time.perf_counter()
+    worker.start()
+    try:
+        while worker.is_alive() and not replay.finished():
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    translator.stop_translator()
+    worker.join()
+    replay.close()
+    print(f"Replay finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
+import sys
 import hid
 import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from engines.capture import CaptureWriter
 
 # Estes são os IDs exatos da imagem que enviou
 VENDOR_ID = 0x0810
 PRODUCT_ID = 0x0001
 
+# Uso: python3 unlimitedOutputs.py [sessao.hidtrace]
+# Com um arquivo, todos os relatórios crus também são gravados (ver engines/capture.py)
+CAPTURE_PATH = sys.argv[1] if len(sys.argv) > 1 else None
+capture = None
+
 print(f"Searching for the gamepad (VID: {hex(VENDOR_ID)}, PID: {hex(PRODUCT_ID)})...")
 
 try:
@@ -17,11 +27,17 @@ try:
     
     print("Success! Now your gamepad is a keyboard")
 
+    if CAPTURE_PATH:
+        capture = CaptureWriter(CAPTURE_PATH)
+        print(f"Capturing raw reports to {CAPTURE_PATH}")
+
     while True:
         # Lê o pacote de dados do comando (geralmente entre 8 a 64 bytes)
         report = gamepad.read(64)
         
         if report:
+            if capture:
+                capture.write(0, report)
             # Imprime no ecrã a lista de números recebida
             print(f"Data: {report}")
         
@@ -33,6 +49,9 @@ except IOError as ex:
 except KeyboardInterrupt:
     print("\nProgram terminated.")
 finally:
+    if capture:
+        capture.close()
+        print(f"{capture.records} reports saved in {CAPTURE_PATH}")
     if 'gamepad' in locals():
         gamepad.close()
         
\ No newline at end of file